@@ -4,21 +4,58 @@ DAILY TRADING MONITOR
 Real-time monitoring system to prevent overtrading and losses
 """
 
+import os
 import sqlite3
-import pandas as pd
+import sys
+import tempfile
 import json
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, time as dt_time
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY, default=str).decode()
+except ImportError:
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj, indent=2, default=str, ensure_ascii=False)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from db_connection import get_conn
+
+def _atomic_write(path: str, text: str):
+    """Write text to path via a temp file + rename so readers never see a partial file"""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix='.tmp_', delete=False) as tmp:
+        tmp.write(text)
+    os.chmod(tmp.name, 0o644)  # NamedTemporaryFile creates 0600
+    os.replace(tmp.name, path)
+
+# Seconds between data_version checks in the monitor loop
+POLL_INTERVAL = 5
 
 class DailyTradingMonitor:
     """
     Real-time monitoring system to track daily trading activity and prevent overtrading
     """
     
-    def __init__(self, db_path: str = 'trading_data.db'):
+    def __init__(self, db_path: str = 'trading_data.db', cache_ttl: float = 3.0):
         self.db_path = db_path
         self.alerts = []
+        # Short-lived cache so a burst of pre-trade checks shares one query
+        self.cache_ttl = cache_ttl
+        self._stats_cache = None  # (monotonic_ts, day, stats)
+        # Set once a limit that can only tighten during the day is hit
+        self._blocked_date = None
+        self._blocked_reason = None
+        
+        # One connection for the lifetime of the monitor
+        self._conn = get_conn(self.db_path)
+        self._ensure_schema()
         self.daily_limits = {
             'max_trades': 10,
             'max_position_size': 2500,
@@ -26,25 +63,69 @@ class DailyTradingMonitor:
             'daily_loss_limit': 500,
             'max_charges': 50
         }
+    
+    def _ensure_schema(self):
+        """Create the daily_reports table and the indexes used by the day-range queries"""
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_reports (
+                    date TEXT PRIMARY KEY,
+                    updated_at TEXT NOT NULL,
+                    report TEXT NOT NULL,
+                    stats_json TEXT NOT NULL
+                )
+            """)
+        try:
+            with self._conn:
+                self._conn.execute("CREATE INDEX IF NOT EXISTS ix_trades_ts ON trades(timestamp)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS ix_trades_symbol_ts ON trades(symbol, timestamp)")
+        except sqlite3.OperationalError:
+            pass  # trades table not created yet
+    
+    @staticmethod
+    def _day_bounds(day: date) -> tuple:
+        """ISO [start, end) bounds for a day, usable against the TEXT timestamp index"""
+        start = datetime.combine(day, dt_time.min)
+        return start.isoformat(), (start + timedelta(days=1)).isoformat()
+    
+    def data_version(self) -> int:
+        """SQLite data_version - changes whenever another connection commits"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def invalidate_stats_cache(self):
+        """Drop cached stats so the next read hits the database"""
+        self._stats_cache = None
         
     def get_today_stats(self) -> Dict:
-        """Get today's trading statistics"""
-        conn = sqlite3.connect(self.db_path)
-        today = date.today().isoformat()
+        """Get today's trading statistics (cached for cache_ttl seconds)"""
+        today = date.today()
+        if self._stats_cache is not None:
+            cached_at, cached_day, cached_stats = self._stats_cache
+            if cached_day == today and time.monotonic() - cached_at < self.cache_ttl:
+                return dict(cached_stats)
+        
+        stats = self._query_today_stats(today)
+        self._stats_cache = (time.monotonic(), today, stats)
+        return dict(stats)
+    
+    def _query_today_stats(self, day: date) -> Dict:
+        """Run the stats query for the given day"""
+        start, end = self._day_bounds(day)
         
-        # Get today's trades
+        # Aggregate in SQL - one row back, no DataFrame
         query = """
-        SELECT * FROM trades 
-        WHERE date(timestamp) = ? 
-        ORDER BY timestamp
+        SELECT COUNT(*), COUNT(DISTINCT symbol), MAX(price * quantity),
+               SUM(price * quantity), MAX(timestamp)
+        FROM trades
+        WHERE timestamp >= ? AND timestamp < ?
         """
         
         try:
-            today_trades = pd.read_sql_query(query, conn, params=[today])
-        except:
-            today_trades = pd.DataFrame()
+            row = self._conn.execute(query, (start, end)).fetchone()
+        except sqlite3.Error:
+            row = None
         
-        if today_trades.empty:
+        if not row or row[0] == 0:
             return {
                 'total_trades': 0,
                 'symbols_traded': 0,
@@ -54,23 +135,11 @@ class DailyTradingMonitor:
                 'last_trade_time': None
             }
         
-        # Calculate statistics
-        total_trades = len(today_trades)
-        symbols_traded = today_trades['symbol'].nunique()
-        
-        # Calculate position sizes
-        today_trades['position_value'] = today_trades['price'] * today_trades['quantity']
-        largest_position = today_trades['position_value'].max()
-        total_volume = today_trades['position_value'].sum()
+        total_trades, symbols_traded, largest_position, total_volume, last_trade_time = row
         
         # Estimate charges (0.1% of volume)
         estimated_charges = total_volume * 0.001
         
-        # Last trade time
-        last_trade_time = today_trades['timestamp'].iloc[-1] if len(today_trades) > 0 else None
-        
-        conn.close()
-        
         return {
             'total_trades': total_trades,
             'symbols_traded': symbols_traded,
@@ -83,31 +152,36 @@ class DailyTradingMonitor:
     def check_alerts(self, stats: Dict) -> List[str]:
         """Check for alert conditions"""
         alerts = []
+        limits = self.daily_limits
+        max_trades = limits['max_trades']
+        total_trades = stats['total_trades']
         
         # Trade count alert
-        if stats['total_trades'] >= self.daily_limits['max_trades']:
-            alerts.append(f"🚨 TRADE LIMIT EXCEEDED: {stats['total_trades']}/{self.daily_limits['max_trades']}")
-        elif stats['total_trades'] >= self.daily_limits['max_trades'] * 0.8:
-            alerts.append(f"⚠️ APPROACHING TRADE LIMIT: {stats['total_trades']}/{self.daily_limits['max_trades']}")
+        if total_trades >= max_trades:
+            alerts.append(f"🚨 TRADE LIMIT EXCEEDED: {total_trades}/{max_trades}")
+        elif total_trades >= max_trades * 0.8:
+            alerts.append(f"⚠️ APPROACHING TRADE LIMIT: {total_trades}/{max_trades}")
         
         # Position size alert
-        if stats['largest_position'] > self.daily_limits['max_position_size']:
+        if stats['largest_position'] > limits['max_position_size']:
             alerts.append(f"🚨 POSITION SIZE EXCEEDED: ₹{stats['largest_position']:,.0f}")
         
         # Symbol diversity alert
-        if stats['symbols_traded'] > self.daily_limits['max_symbols']:
-            alerts.append(f"⚠️ TOO MANY SYMBOLS: {stats['symbols_traded']}/{self.daily_limits['max_symbols']}")
+        if stats['symbols_traded'] > limits['max_symbols']:
+            alerts.append(f"⚠️ TOO MANY SYMBOLS: {stats['symbols_traded']}/{limits['max_symbols']}")
         
         # Charges alert
-        if stats['estimated_charges'] > self.daily_limits['max_charges']:
+        if stats['estimated_charges'] > limits['max_charges']:
             alerts.append(f"💸 HIGH CHARGES: ₹{stats['estimated_charges']:,.0f}")
         
         return alerts
     
-    def generate_daily_report(self) -> str:
+    def generate_daily_report(self, stats: Optional[Dict] = None, alerts: Optional[List[str]] = None) -> str:
         """Generate comprehensive daily report"""
-        stats = self.get_today_stats()
-        alerts = self.check_alerts(stats)
+        if stats is None:
+            stats = self.get_today_stats()
+        if alerts is None:
+            alerts = self.check_alerts(stats)
         
         report = f"""
 📊 DAILY TRADING MONITOR - {date.today()}
@@ -153,11 +227,15 @@ class DailyTradingMonitor:
     
     def should_allow_trade(self, symbol: str, position_size: float) -> tuple:
         """Check if a new trade should be allowed"""
+        today = date.today()
+        if self._blocked_date == today:
+            return False, self._blocked_reason
+        
         stats = self.get_today_stats()
         
         # Check trade count
         if stats['total_trades'] >= self.daily_limits['max_trades']:
-            return False, "Daily trade limit reached"
+            return self._block_for_day(today, "Daily trade limit reached")
         
         # Check position size
         if position_size > self.daily_limits['max_position_size']:
@@ -166,49 +244,84 @@ class DailyTradingMonitor:
         # Check symbol count
         if stats['symbols_traded'] >= self.daily_limits['max_symbols']:
             # Check if this is a new symbol
-            conn = sqlite3.connect(self.db_path)
-            today = date.today().isoformat()
+            start, end = self._day_bounds(today)
             
             query = """
-            SELECT DISTINCT symbol FROM trades 
-            WHERE date(timestamp) = ?
+            SELECT 1 FROM trades
+            WHERE symbol = ? AND timestamp >= ? AND timestamp < ?
+            LIMIT 1
             """
-            today_symbols = pd.read_sql_query(query, conn, params=[today])['symbol'].tolist()
-            conn.close()
+            traded_today = self._conn.execute(query, (symbol, start, end)).fetchone() is not None
             
-            if symbol not in today_symbols:
+            if not traded_today:
                 return False, f"Too many symbols traded today: {stats['symbols_traded']}"
         
         # Check estimated daily charges
+        if stats['estimated_charges'] >= self.daily_limits['max_charges']:
+            return self._block_for_day(today, f"Daily charges limit reached: ₹{stats['estimated_charges']:.2f}")
         new_charges = stats['estimated_charges'] + (position_size * 0.001)
         if new_charges > self.daily_limits['max_charges']:
             return False, f"Daily charges limit would be exceeded: ₹{new_charges:.2f}"
         
         return True, "Trade allowed"
     
-    def save_daily_report(self):
+    def _block_for_day(self, day: date, reason: str) -> tuple:
+        """Remember a terminal rejection so later checks today skip the database"""
+        self._blocked_date = day
+        self._blocked_reason = reason
+        return False, reason
+    
+    def store_daily_report(self, stats: Optional[Dict] = None, alerts: Optional[List[str]] = None):
+        """Upsert today's report into the daily_reports table (one row per day)"""
+        if stats is None:
+            stats = self.get_today_stats()
+        if alerts is None:
+            alerts = self.check_alerts(stats)
+        report = self.generate_daily_report(stats, alerts)
+        
+        today = date.today().isoformat()
+        stats['date'] = today
+        stats['alerts'] = alerts
+        
+        with self._conn:
+            self._conn.execute("""
+                INSERT INTO daily_reports (date, updated_at, report, stats_json)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(date) DO UPDATE SET
+                updated_at=excluded.updated_at,
+                report=excluded.report,
+                stats_json=excluded.stats_json
+            """, (today, datetime.now().isoformat(), report, _json_dumps(stats)))
+        
+        return report
+    
+    def save_daily_report(self, stats: Optional[Dict] = None, alerts: Optional[List[str]] = None):
         """Save daily report to file"""
-        report = self.generate_daily_report()
-        stats = self.get_today_stats()
+        if stats is None:
+            stats = self.get_today_stats()
+        if alerts is None:
+            alerts = self.check_alerts(stats)
+        report = self.generate_daily_report(stats, alerts)
         
         # Save text report
         filename = f"daily_report_{date.today()}.txt"
-        with open(filename, 'w') as f:
-            f.write(report)
+        _atomic_write(filename, report)
         
         # Save JSON data
         json_filename = f"daily_stats_{date.today()}.json"
         stats['date'] = date.today().isoformat()
-        stats['alerts'] = self.check_alerts(stats)
-        
-        with open(json_filename, 'w') as f:
-            json.dump(stats, f, indent=2, default=str)
+        stats['alerts'] = alerts
+        _atomic_write(json_filename, _json_dumps(stats))
         
         print(report)
         print(f"\n💾 Reports saved: {filename}, {json_filename}")
         
         return filename, json_filename
 
+def _next_hour(now: datetime) -> datetime:
+    """Top of the hour following now"""
+    return (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+
 def main():
     """Main monitoring function"""
     monitor = DailyTradingMonitor()
@@ -216,19 +329,30 @@ def main():
     print("🚀 STARTING DAILY TRADING MONITOR")
     print("=" * 50)
     
+    last_version = None
+    last_day = None
+    next_save = _next_hour(datetime.now())
+    
     while True:
         try:
-            # Generate and display report
-            report = monitor.generate_daily_report()
-            print(f"\n{report}")
+            # Only rebuild the report when new trades were committed
+            version = monitor.data_version()
+            if version != last_version or date.today() != last_day:
+                last_version = version
+                last_day = date.today()
+                monitor.invalidate_stats_cache()
+                report = monitor.generate_daily_report()
+                print(f"\n{report}")
             
-            # Save report every hour
-            current_time = datetime.now()
-            if current_time.minute == 0:  # Top of the hour
-                monitor.save_daily_report()
+            # Snapshot report every hour
+            now = datetime.now()
+            if now >= next_save:
+                monitor.store_daily_report()
+                print(f"💾 Hourly report stored in daily_reports ({now:%H:%M})")
+                next_save = _next_hour(now)
             
-            # Sleep for 5 minutes before next check
-            time.sleep(300)
+            # data_version is a cheap check, so wake often but never past the next save
+            time.sleep(min(POLL_INTERVAL, max((next_save - datetime.now()).total_seconds(), 0)))
             
         except KeyboardInterrupt:
             print("\n🛑 Monitoring stopped by user")
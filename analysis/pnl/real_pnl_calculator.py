@@ -4,31 +4,150 @@ REAL PnL CALCULATOR
 Calculate the actual PnL including open positions using current portfolio state
 """
 
+import os
 import sqlite3
+import sys
+import numpy as np
 import pandas as pd
 import json
 from datetime import datetime
 
-def calculate_real_pnl():
-    """Calculate real PnL including unrealized gains/losses"""
-    
-    print("💰 REAL PnL ANALYSIS - INCLUDING OPEN POSITIONS")
-    print("=" * 60)
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY, default=str).decode()
+except ImportError:
+    _json_loads = json.loads
+
+    # ensure_ascii=False writes raw UTF-8 like orjson instead of \uXXXX escapes
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj, indent=2, default=str, ensure_ascii=False)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from db_connection import get_conn
+
+DB_PATH = 'trading_data.db'
+
+def _frequency(values: pd.Series) -> list:
+    """(value, count) pairs, most frequent first - value_counts without the Series overhead"""
+    codes, uniques = pd.factorize(values, sort=False)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = np.argsort(-counts, kind='stable')
+    return list(zip(uniques[order].tolist(), counts[order].tolist()))
+
+def _positions_from_json(conn: sqlite3.Connection):
+    """Value open positions from the position_details JSON blobs"""
+    positions = pd.DataFrame.from_records(
+        conn.execute("SELECT symbol, position_details FROM open_positions").fetchall(),
+        columns=['symbol', 'position_details']
+    )
+    
+    if positions.empty:
+        return pd.DataFrame(columns=['symbol', 'action', 'entry_price', 'quantity', 'position_value']), 0
+    
+    # Decode all position blobs once and value them column-wise
+    details = pd.json_normalize(positions['position_details'].map(_json_loads).tolist())
+    position_values = details['entry_price'].to_numpy() * details['quantity'].to_numpy()
+    positions = pd.DataFrame({
+        'symbol': positions['symbol'].to_numpy(),
+        'action': details['action'].to_numpy(),
+        'entry_price': details['entry_price'].to_numpy(),
+        'quantity': details['quantity'].to_numpy(),
+        'position_value': position_values,
+    })
+    return positions, float(position_values.sum())
+
+def _compute_pnl(active_strategy: str = 'SankhyaEkStrategy') -> dict:
+    """Compute PnL figures and tables without printing anything"""
+    conn = get_conn(DB_PATH)
     
-    conn = sqlite3.connect('trading_data.db')
+    # Get portfolio state - one row, no DataFrame needed
+    initial_capital, current_capital, banked_profit, total_charges = conn.execute(
+        "SELECT initial_capital, trading_capital, banked_profit, total_charges "
+        "FROM portfolio_state WHERE strategy_name = ?",
+        (active_strategy,)
+    ).fetchone()
     
-    # Get portfolio state
-    portfolio_df = pd.read_sql_query("SELECT * FROM portfolio_state", conn)
-    active_strategy = 'SankhyaEkStrategy'  # Only this one has trades
+    # Calculate realized PnL from closed trades
+    trade_rows = conn.execute(
+        "SELECT timestamp, symbol, action, price FROM trades ORDER BY timestamp"
+    ).fetchall()
+    trades_df = pd.DataFrame.from_records(trade_rows, columns=['timestamp', 'symbol', 'action', 'price'])
+    trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'], format='ISO8601', cache=True)
+    
+    # Classify action labels once on the (few) categories, not per row
+    actions = trades_df['action'].astype('category')
+    categories = actions.cat.categories
+    exit_mask = actions.isin([c for c in categories if 'EXIT' in c])
+    final_exit_mask = actions.isin([c for c in categories if 'FINAL_EXIT' in c])
+    loss_mask = actions.isin([c for c in categories if 'LOSS' in c])
+    loss_idx = np.flatnonzero(loss_mask.to_numpy())
+    symbols = trades_df['symbol'].to_numpy()
+    action_values = trades_df['action'].to_numpy()
+    prices = trades_df['price'].to_numpy()
+    
+    # Current position analysis - value positions inside SQLite
+    try:
+        positions = pd.DataFrame.from_records(
+            conn.execute(
+                "SELECT symbol, action, entry_price, quantity, entry_price * quantity FROM open_positions"
+            ).fetchall(),
+            columns=['symbol', 'action', 'entry_price', 'quantity', 'position_value']
+        )
+        total_position_value = conn.execute(
+            "SELECT COALESCE(SUM(entry_price * quantity), 0) FROM open_positions"
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        # Database not migrated yet (no entry_price/quantity columns) - decode the JSON
+        positions, total_position_value = _positions_from_json(conn)
     
-    strategy_data = portfolio_df[portfolio_df['strategy_name'] == active_strategy].iloc[0]
+    # Calculate unrealized PnL (approximate)
+    unrealized_pnl = (current_capital + total_position_value) - initial_capital
     
-    initial_capital = strategy_data['initial_capital']
-    current_capital = strategy_data['trading_capital']
-    banked_profit = strategy_data['banked_profit']
-    total_charges = strategy_data['total_charges']
+    # Check for pattern in heavy trading
+    symbol_frequency = _frequency(trades_df['symbol'])
     
-    print(f"📊 PORTFOLIO ANALYSIS FOR {active_strategy}:")
+    return {
+        'strategy': active_strategy,
+        'initial_capital': initial_capital,
+        'current_capital': current_capital,
+        'banked_profit': banked_profit,
+        'total_charges': total_charges,
+        'total_trades': len(trades_df),
+        'action_counts': _frequency(trades_df['action']),
+        'normal_exits': int(exit_mask.sum()),
+        'final_exits': int(final_exit_mask.sum()),
+        'positions': positions,
+        'total_position_value': total_position_value,
+        'unrealized_pnl': unrealized_pnl,
+        'loss_percentage': abs(unrealized_pnl) / initial_capital * 100,
+        'loss_exits': list(zip(symbols[loss_idx], action_values[loss_idx], prices[loss_idx])),
+        'heavy_traded': [(symbol, count) for symbol, count in symbol_frequency if count > 4],
+        'daily_trades': trades_df.groupby(trades_df['timestamp'].dt.floor('D')).agg(
+            count=('price', 'size'), total=('price', 'sum')
+        ),
+    }
+
+def _render_pnl(result: dict):
+    """Print the PnL analysis computed by _compute_pnl"""
+    initial_capital = result['initial_capital']
+    current_capital = result['current_capital']
+    banked_profit = result['banked_profit']
+    total_charges = result['total_charges']
+    positions = result['positions']
+    total_position_value = result['total_position_value']
+    unrealized_pnl = result['unrealized_pnl']
+    loss_exits = result['loss_exits']
+    heavy_traded = result['heavy_traded']
+    daily_trades = result['daily_trades']
+    
+    print(f"📊 PORTFOLIO ANALYSIS FOR {result['strategy']}:")
     print(f"   Initial Capital: ₹{initial_capital:,.2f}")
     print(f"   Current Trading Capital: ₹{current_capital:,.2f}")
     print(f"   Banked Profit: ₹{banked_profit:,.2f}")
@@ -38,24 +157,15 @@ def calculate_real_pnl():
     capital_used = initial_capital - current_capital
     print(f"   Capital Used in Trades: ₹{capital_used:,.2f}")
     
-    # Calculate realized PnL from closed trades
-    trades_df = pd.read_sql_query("SELECT * FROM trades ORDER BY timestamp", conn)
-    trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'])
-    
     print(f"\n🔍 TRADE ANALYSIS:")
-    print(f"   Total Trade Records: {len(trades_df)}")
+    print(f"   Total Trade Records: {result['total_trades']}")
     
-    action_counts = trades_df['action'].value_counts()
-    for action, count in action_counts.items():
+    for action, count in result['action_counts']:
         print(f"   {action}: {count}")
     
-    # Calculate realized PnL from EXIT trades
-    exit_trades = trades_df[trades_df['action'].str.contains('EXIT', na=False)]
-    final_exit_trades = trades_df[trades_df['action'].str.contains('FINAL_EXIT', na=False)]
-    
     print(f"\n📈 REALIZED TRADES:")
-    print(f"   Normal Exits: {len(exit_trades)}")
-    print(f"   Final Exits (Stop Loss): {len(final_exit_trades)}")
+    print(f"   Normal Exits: {result['normal_exits']}")
+    print(f"   Final Exits (Stop Loss): {result['final_exits']}")
     
     # Estimate realized PnL from charges and capital movement
     # If we spent charges but capital reduced more than trades, there are losses
@@ -66,31 +176,20 @@ def calculate_real_pnl():
     print(f"   Charges Paid: ₹{total_charges:,.2f}")
     print(f"   Trading Loss (approx): ₹{net_effect - total_charges:,.2f}")
     
-    # Current position analysis
-    positions_df = pd.read_sql_query("SELECT * FROM open_positions", conn)
-    
-    print(f"\n📋 CURRENT OPEN POSITIONS: {len(positions_df)}")
-    
-    total_position_value = 0
-    for _, pos in positions_df.iterrows():
-        details = json.loads(pos['position_details'])
-        symbol = pos['symbol']
-        action = details['action']
-        entry_price = details['entry_price']
-        quantity = details['quantity']
-        position_value = entry_price * quantity
-        total_position_value += position_value
-        
-        print(f"   {symbol}: {action} @ ₹{entry_price} x {quantity} = ₹{position_value:,.2f}")
+    print(f"\n📋 CURRENT OPEN POSITIONS: {len(positions)}")
+    if not positions.empty:
+        print("\n".join(
+            f"   {symbol}: {action} @ ₹{entry_price} x {quantity} = ₹{position_value:,.2f}"
+            for symbol, action, entry_price, quantity, position_value in zip(
+                positions['symbol'], positions['action'], positions['entry_price'],
+                positions['quantity'], positions['position_value'])
+        ))
     
     print(f"\n💼 POSITION SUMMARY:")
     print(f"   Total Position Value: ₹{total_position_value:,.2f}")
     print(f"   Available Cash: ₹{current_capital:,.2f}")
     print(f"   Total Account Value: ₹{current_capital + total_position_value:,.2f}")
     
-    # Calculate unrealized PnL (approximate)
-    unrealized_pnl = (current_capital + total_position_value) - initial_capital
-    
     print(f"\n🎯 PERFORMANCE SUMMARY:")
     print(f"   Starting Capital: ₹{initial_capital:,.2f}")
     print(f"   Current Total Value: ₹{current_capital + total_position_value:,.2f}")
@@ -106,40 +205,31 @@ def calculate_real_pnl():
     print(f"\n🔍 LOSS PATTERN ANALYSIS:")
     
     # Count different types of exits
-    loss_exits = trades_df[trades_df['action'].str.contains('LOSS', na=False)]
     print(f"   Stop Loss Exits: {len(loss_exits)}")
     
     if len(loss_exits) > 0:
-        print(f"   Stop Loss Symbols:")
-        for _, trade in loss_exits.iterrows():
-            print(f"     {trade['symbol']}: {trade['action']} @ ₹{trade['price']}")
-    
-    # Check for pattern in heavy trading
-    symbol_frequency = trades_df['symbol'].value_counts()
-    heavy_traded = symbol_frequency[symbol_frequency > 4]
+        lines = [f"   Stop Loss Symbols:"]
+        lines.extend(f"     {symbol}: {action} @ ₹{price}" for symbol, action, price in loss_exits)
+        print("\n".join(lines))
     
     print(f"\n📊 HEAVILY TRADED SYMBOLS (>4 trades):")
-    for symbol, count in heavy_traded.items():
+    for symbol, count in heavy_traded:
         print(f"   {symbol}: {count} trades")
     
     # Time analysis
     print(f"\n⏰ TRADING TIMELINE:")
-    daily_trades = trades_df.groupby(trades_df['timestamp'].dt.date).size()
-    for date, count in daily_trades.items():
-        daily_amount = trades_df[trades_df['timestamp'].dt.date == date]['price'].sum()
-        print(f"   {date}: {count} trades, ₹{daily_amount:,.0f} total volume")
+    for day, count, daily_amount in zip(daily_trades.index, daily_trades['count'], daily_trades['total']):
+        print(f"   {day.date()}: {count} trades, ₹{daily_amount:,.0f} total volume")
     
     # Generate recommendations
     print(f"\n🎯 KEY FINDINGS & RECOMMENDATIONS:")
     print(f"=" * 50)
     
-    loss_percentage = abs(unrealized_pnl) / initial_capital * 100
-    
     if unrealized_pnl < 0:
-        print(f"1. 🚨 CRITICAL: {loss_percentage:.1f}% capital loss detected")
+        print(f"1. 🚨 CRITICAL: {result['loss_percentage']:.1f}% capital loss detected")
         print(f"2. 💸 High charges (₹{total_charges:,.2f}) suggest overtrading")
         print(f"3. 📉 {len(loss_exits)} stop-loss exits indicate poor entry timing")
-        print(f"4. 🔄 {len(positions_df)} open positions carry unrealized risk")
+        print(f"4. 🔄 {len(positions)} open positions carry unrealized risk")
         
         print(f"\n🔧 IMMEDIATE ACTIONS NEEDED:")
         print(f"   • Reduce position sizes to limit losses")
@@ -147,17 +237,26 @@ def calculate_real_pnl():
         print(f"   • Review stop-loss levels (too tight?)")
         print(f"   • Consider closing losing positions")
         print(f"   • Analyze why {len(heavy_traded)} symbols traded heavily")
+
+def calculate_real_pnl(verbose: bool = True):
+    """Calculate real PnL including unrealized gains/losses"""
+    
+    if verbose:
+        print("💰 REAL PnL ANALYSIS - INCLUDING OPEN POSITIONS")
+        print("=" * 60)
     
-    conn.close()
+    result = _compute_pnl()
+    if verbose:
+        _render_pnl(result)
     
     return {
-        'initial_capital': initial_capital,
-        'current_value': current_capital + total_position_value,
-        'unrealized_pnl': unrealized_pnl,
-        'loss_percentage': loss_percentage,
-        'charges_paid': total_charges,
-        'open_positions': len(positions_df),
-        'stop_loss_exits': len(loss_exits)
+        'initial_capital': result['initial_capital'],
+        'current_value': result['current_capital'] + result['total_position_value'],
+        'unrealized_pnl': result['unrealized_pnl'],
+        'loss_percentage': result['loss_percentage'],
+        'charges_paid': result['total_charges'],
+        'open_positions': len(result['positions']),
+        'stop_loss_exits': len(result['loss_exits'])
     }
 
 if __name__ == "__main__":
@@ -165,6 +264,6 @@ if __name__ == "__main__":
     
     # Save summary
     with open('real_pnl_analysis.json', 'w') as f:
-        json.dump(result, f, indent=2, default=str)
+        f.write(_json_dumps(result))
     
     print(f"\n💾 Analysis saved to: real_pnl_analysis.json")
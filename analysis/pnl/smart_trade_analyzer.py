@@ -4,12 +4,274 @@ SMART TRADE PnL ANALYZER
 Calculates PnL from entry/exit trades and analyzes performance patterns
 """
 
+import importlib.util
+import io
+import os
 import sqlite3
+import sys
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
-from collections import defaultdict
+
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        # Timestamps go through default=str so the report text matches json.dump
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME,
+            default=str,
+        )
+
+    def _json_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY, default=str)
+except ImportError:  # stdlib fallback, non-ASCII kept as UTF-8 to match orjson
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, default=str, ensure_ascii=False).encode()
+
+    def _json_line(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':'), default=str, ensure_ascii=False).encode()
+
+try:
+    import polars as pl
+except ImportError:  # pandas groupbys are used instead
+    pl = None
+# pl.from_pandas / to_pandas go through pyarrow, which polars imports when converting
+if importlib.util.find_spec('pyarrow') is None:
+    pl = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from db_connection import get_conn
+
+# Trades columns used by the PnL pairing
+TRADE_COLUMNS = ['id', 'timestamp', 'strategy_name', 'symbol', 'action', 'price', 'quantity']
+LOAD_CHUNK_ROWS = 100_000
+
+# A SHORT closes the oldest open LONG with the same strategy, symbol and quantity
+MATCH_KEYS = ['strategy_name', 'symbol', 'quantity']
+
+# Trade timestamps are isoformat() text, which drops the fraction when microseconds are 0
+TIMESTAMP_FORMAT = 'ISO8601'
+NS_PER_MINUTE = 60_000_000_000
+
+# Report files written by create_comprehensive_report
+REPORT_FILE = 'comprehensive_trade_report.json'
+TRADES_FILE = 'comprehensive_trade_report_trades.jsonl'
+
+# Outcome buckets from np.sign(net_pnl) + 1
+LOSS, BREAKEVEN, WIN = 0, 1, 2
+
+# PnL columns the per-strategy / per-symbol reports aggregate
+GROUPBY_COLUMNS = ['strategy', 'symbol', 'gross_pnl', 'charges', 'net_pnl', 'duration_minutes']
+
+def _pnl_frame(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Add PnL, charges and duration columns to matched entry/exit pairs"""
+    entry_price = pairs['entry_price']
+    exit_price = pairs['exit_price']
+    quantity = pairs['quantity']
+    gross_pnl = (exit_price - entry_price) * quantity
+    # Durations from raw int64 nanoseconds, no Timedelta round trip
+    entry_ns = pairs['entry_time'].to_numpy(dtype='datetime64[ns]').view('i8')
+    exit_ns = pairs['exit_time'].to_numpy(dtype='datetime64[ns]').view('i8')
+    # Approximate 0.1% charges on the larger leg
+    charges = np.maximum(entry_price, exit_price) * quantity * 0.001
+    
+    # Few distinct strategies/symbols: categorical keys group on integer codes
+    return pd.DataFrame({
+        'strategy': pairs['strategy'].astype('category'),
+        'symbol': pairs['symbol'].astype('category'),
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'quantity': quantity.astype('int32'),
+        'gross_pnl': gross_pnl,
+        'charges': charges,
+        'net_pnl': gross_pnl - charges,
+        'entry_time': pairs['entry_time'],
+        'exit_time': pairs['exit_time'],
+        'duration_minutes': (exit_ns - entry_ns) / NS_PER_MINUTE,
+        'entry_trade_id': pairs['entry_trade_id'],
+        'exit_trade_id': pairs['exit_trade_id'],
+    })
+
+def _sorted_legs(trades: pd.DataFrame):
+    """LONG/SHORT trades in (timestamp, id) order plus their integer match-group codes"""
+    legs = trades[trades['action'].isin(['LONG', 'SHORT'])]
+    legs = legs.sort_values(['timestamp', 'id'], kind='stable')
+    # Hash the (strategy, symbol, quantity) key once; everything after works on int codes
+    groups = legs.groupby(MATCH_KEYS, sort=False).ngroup().to_numpy()
+    return legs, groups
+
+def _paired_pnl_frame(legs: pd.DataFrame, entry_rows, exit_rows) -> pd.DataFrame:
+    """PnL frame in exit order from positional entry/exit rows of the time-sorted legs"""
+    by_exit = np.argsort(exit_rows, kind='stable')
+    entries = legs.iloc[entry_rows[by_exit]].reset_index(drop=True)
+    exits = legs.iloc[exit_rows[by_exit]].reset_index(drop=True)
+    return _pnl_frame(pd.DataFrame({
+        'strategy': exits['strategy_name'],
+        'symbol': exits['symbol'],
+        'entry_price': entries['price'],
+        'exit_price': exits['price'],
+        'quantity': exits['quantity'],
+        'entry_time': entries['timestamp'],
+        'exit_time': exits['timestamp'],
+        'entry_trade_id': entries['id'],
+        'exit_trade_id': exits['id'],
+    }))
+
+def _fifo_kernel(groups, is_long):
+    """
+    FIFO pairing over rows sorted by group, then time.
+    
+    Each group's open LONGs live in a head/tail window of one shared queue array,
+    so a SHORT closes the oldest one in O(1) and a SHORT with nothing open is skipped.
+    Returns (entry row, exit row) index arrays.
+    """
+    n = len(groups)
+    queue = np.empty(n, np.int64)
+    entry_rows = np.empty(n, np.int64)
+    exit_rows = np.empty(n, np.int64)
+    head = 0
+    tail = 0
+    matched = 0
+    current = -1
+    for i in range(n):
+        if groups[i] != current:
+            current = groups[i]
+            head = 0
+            tail = 0
+        if is_long[i]:
+            queue[tail] = i
+            tail += 1
+        elif head < tail:
+            entry_rows[matched] = queue[head]
+            exit_rows[matched] = i
+            head += 1
+            matched += 1
+    return entry_rows[:matched], exit_rows[:matched]
+
+_fifo_kernel_jit = None
+
+def _compiled_fifo_kernel():
+    """
+    numba-compiled _fifo_kernel, or None without numba.
+    
+    numba is imported on first use: the SQL pairing path never needs it and the
+    import alone costs about 0.1s of script startup.
+    """
+    global _fifo_kernel_jit
+    if _fifo_kernel_jit is None:
+        try:
+            from numba import njit
+        except ImportError:  # the pandas running-balance matcher is used instead
+            _fifo_kernel_jit = False
+        else:
+            _fifo_kernel_jit = njit(cache=True)(_fifo_kernel)
+    return _fifo_kernel_jit or None
+
+def match_trade_pairs_jit(trades: pd.DataFrame):
+    """
+    match_trade_pairs with the pairing loop compiled by numba.
+    
+    Returns (pnl DataFrame in exit order, number of unmatched LONGs).
+    """
+    legs, groups = _sorted_legs(trades)
+    is_long = legs['action'].to_numpy() == 'LONG'
+    
+    # Group-major order keeps each group's rows contiguous and in time order
+    order = np.argsort(groups, kind='stable')
+    entry_rows, exit_rows = _compiled_fifo_kernel()(groups[order], is_long[order])
+    
+    pnl_df = _paired_pnl_frame(legs, order[entry_rows], order[exit_rows])
+    open_positions_count = int(is_long.sum()) - len(pnl_df)
+    return pnl_df, open_positions_count
+
+def match_trade_pairs(trades: pd.DataFrame):
+    """
+    FIFO-match LONG entries to SHORT exits with column operations.
+    
+    Within each (strategy, symbol, quantity) group the open-LONG count is a running
+    sum of +1/-1 steps. A SHORT that arrives with nothing open is ignored, which is
+    exactly when that running sum drops to a new low below zero. After removing
+    those, the n-th SHORT closes the n-th LONG.
+    
+    Pairing is then index arithmetic: sorted by group with each group's LONGs ahead
+    of its SHORTs (time order kept inside both blocks), the SHORT at position p is
+    closed by the LONG at p - (LONG count of its group).
+    
+    Returns (pnl DataFrame in exit order, number of unmatched LONGs).
+    """
+    legs, groups = _sorted_legs(trades)
+    
+    is_long = legs['action'].to_numpy() == 'LONG'
+    step = np.where(is_long, 1, -1)
+    balance = pd.Series(step, index=legs.index).groupby(groups).cumsum()
+    prior_low = balance.groupby(groups).cummin().groupby(groups).shift(fill_value=0).clip(upper=0)
+    kept = (step > 0) | (balance >= prior_low).to_numpy()
+    legs, groups, is_long = legs[kept], groups[kept], is_long[kept]
+    
+    # np.lexsort is stable: primary key group, then LONG (False) before SHORT
+    order = np.lexsort((~is_long, groups))
+    long_count = np.bincount(groups[is_long], minlength=len(groups) and groups.max() + 1)
+    exit_pos = np.flatnonzero(~is_long[order])
+    entry_pos = exit_pos - long_count[groups[order][exit_pos]]
+    
+    pnl_df = _paired_pnl_frame(legs, order[entry_pos], order[exit_pos])
+    open_positions_count = int(is_long.sum()) - len(pnl_df)
+    return pnl_df, open_positions_count
+
+# Same FIFO rule as match_trade_pairs, evaluated by SQLite (window functions need >= 3.25)
+PAIR_TRADES_SQL = """
+WITH legs AS (
+    SELECT id, timestamp, strategy_name, symbol, action, price, quantity,
+           SUM(CASE WHEN action = 'LONG' THEN 1 ELSE -1 END) OVER (
+               PARTITION BY strategy_name, symbol, quantity ORDER BY timestamp, id
+           ) AS balance
+    FROM trades
+    WHERE action IN ('LONG', 'SHORT')
+),
+marked AS (
+    SELECT *, MIN(MIN(balance, 0)) OVER (
+               PARTITION BY strategy_name, symbol, quantity ORDER BY timestamp, id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ) AS prior_low
+    FROM legs
+),
+kept AS (
+    SELECT *, ROW_NUMBER() OVER (
+               PARTITION BY strategy_name, symbol, quantity, action ORDER BY timestamp, id
+           ) AS seq
+    FROM marked
+    WHERE action = 'LONG' OR balance >= COALESCE(prior_low, 0)
+)
+SELECT s.strategy_name AS strategy, s.symbol, l.price AS entry_price, s.price AS exit_price,
+       s.quantity, l.timestamp AS entry_time, s.timestamp AS exit_time,
+       l.id AS entry_trade_id, s.id AS exit_trade_id
+FROM kept s
+JOIN kept l
+  ON l.strategy_name = s.strategy_name AND l.symbol = s.symbol
+ AND l.quantity = s.quantity AND l.seq = s.seq AND l.action = 'LONG'
+WHERE s.action = 'SHORT'
+ORDER BY s.timestamp, s.id
+"""
+
+def pair_trades_sql(conn: sqlite3.Connection):
+    """
+    Run the FIFO pairing inside SQLite and return the same result as match_trade_pairs.
+    
+    Raises sqlite3.Error when the engine lacks window functions.
+    """
+    pairs = pd.read_sql_query(PAIR_TRADES_SQL, conn)
+    for col in ('entry_time', 'exit_time'):
+        pairs[col] = pd.to_datetime(pairs[col], format=TIMESTAMP_FORMAT)
+    
+    pnl_df = _pnl_frame(pairs)
+    long_count = conn.execute("SELECT COUNT(*) FROM trades WHERE action = 'LONG'").fetchone()[0]
+    return pnl_df, long_count - len(pnl_df)
 
 class SmartTradeAnalyzer:
     """
@@ -20,34 +282,128 @@ class SmartTradeAnalyzer:
         self.db_path = db_path
         self.conn = None
         self.trades_df = None
-        self.calculated_pnl = []
+        self._pnl_df = None
+        self._pnl_records = None
+        self._pnl_pl = None
+        self._outcomes = None
+        self._net_pnl_by = {}
         
     def connect_db(self):
         """Connect to trading database"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = get_conn(self.db_path)
             print(f"✅ Connected to database: {self.db_path}")
+            self._ensure_indexes()
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
             return False
     
+    def _ensure_indexes(self):
+        """Index backing the FIFO pairing query's partitions"""
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_trades_match "
+                    "ON trades(strategy_name, symbol, quantity, action, timestamp)"
+                )
+        except sqlite3.OperationalError:
+            pass  # trades table missing or database read-only
+    
+    @property
+    def calculated_pnl(self) -> list:
+        """Matched trades as a list of dicts, built on first use"""
+        if self._pnl_df is None:
+            return []
+        if self._pnl_records is None:
+            self._pnl_records = self._pnl_df.to_dict('records')
+        return self._pnl_records
+    
+    def _outcome_totals(self):
+        """Trade count and net PnL sum per LOSS/BREAKEVEN/WIN bucket, one pass over net_pnl"""
+        if self._outcomes is None:
+            net = self._pnl_df['net_pnl'].to_numpy()
+            outcome = np.sign(net).astype(np.int8) + 1
+            self._outcomes = (
+                np.bincount(outcome, minlength=3),
+                np.bincount(outcome, weights=net, minlength=3),
+            )
+        return self._outcomes
+    
+    def _net_by(self, key: str) -> pd.Series:
+        """Net PnL summed per strategy or symbol, reusing strategy/symbol_performance's sums"""
+        if key not in self._net_pnl_by:
+            if self._pnl_pl is not None:
+                net = self._pnl_pl.group_by(key).agg(pl.col('net_pnl').sum()).sort(key).to_pandas()
+                self._net_pnl_by[key] = net.set_index(key)['net_pnl']
+            else:
+                self._net_pnl_by[key] = self._pnl_df.groupby(key, observed=True)['net_pnl'].sum()
+        return self._net_pnl_by[key]
+    
+    def _loss_table(self, key: str) -> pd.DataFrame:
+        """Loss count and absolute loss per strategy or symbol"""
+        if self._pnl_pl is not None:
+            loss_table = (
+                self._pnl_pl.filter(pl.col('net_pnl') < 0)
+                .group_by(key)
+                .agg([
+                    pl.len().alias('Loss_Count'),
+                    pl.col('net_pnl').sum().round(2).alias('Total_Loss'),
+                ])
+                .sort(key)
+                .to_pandas()
+                .set_index(key)
+            )
+        else:
+            losing_trades = self._pnl_df[self._pnl_df['net_pnl'] < 0]
+            loss_table = losing_trades.groupby(key, observed=True)['net_pnl'].agg(['count', 'sum']).round(2)
+            loss_table.columns = ['Loss_Count', 'Total_Loss']
+        loss_table['Total_Loss'] = abs(loss_table['Total_Loss'])
+        return loss_table
+    
+    def export_trades_jsonl(self, path: str = TRADES_FILE):
+        """
+        Write matched trades one JSON object per line straight from the PnL columns.
+
+        Floats are written at full precision (to_json would round them to 10
+        significant digits). This file replaces the old inline
+        'detailed_trades' list of the report JSON.
+        """
+        trades = self._pnl_df.assign(
+            entry_time=self._pnl_df['entry_time'].astype(str),
+            exit_time=self._pnl_df['exit_time'].astype(str),
+        )
+        with open(path, 'wb') as f:
+            for record in trades.to_dict('records'):
+                f.write(_json_line(record))
+                f.write(b'\n')
+    
+    def _has_pnl(self) -> bool:
+        """True once calculate_trade_pnl has produced at least one matched trade"""
+        return self._pnl_df is not None and not self._pnl_df.empty
+    
     def load_all_data(self):
         """Load all trading data"""
         if not self.connect_db():
             return False
         
-        # Load trades
-        self.trades_df = pd.read_sql_query("SELECT * FROM trades ORDER BY timestamp", self.conn)
+        # Load trades - only the columns the pairing uses, streamed in chunks
+        chunks = pd.read_sql_query(
+            f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades ORDER BY timestamp",
+            self.conn,
+            parse_dates={'timestamp': {'format': TIMESTAMP_FORMAT}},
+            dtype={'quantity': 'int32'},
+            chunksize=LOAD_CHUNK_ROWS
+        )
+        self.trades_df = pd.concat(list(chunks), ignore_index=True)
         print(f"📊 Loaded {len(self.trades_df)} trade records")
         
-        # Load portfolio state
-        portfolio_df = pd.read_sql_query("SELECT * FROM portfolio_state", self.conn)
-        print(f"💼 Portfolio states: {len(portfolio_df)}")
+        # Portfolio state and open positions are only counted here
+        portfolio_count = self.conn.execute("SELECT COUNT(*) FROM portfolio_state").fetchone()[0]
+        print(f"💼 Portfolio states: {portfolio_count}")
         
-        # Load open positions
-        positions_df = pd.read_sql_query("SELECT * FROM open_positions", self.conn)
-        print(f"📈 Open positions: {len(positions_df)}")
+        positions_count = self.conn.execute("SELECT COUNT(*) FROM open_positions").fetchone()[0]
+        print(f"📈 Open positions: {positions_count}")
         
         return True
     
@@ -56,94 +412,41 @@ class SmartTradeAnalyzer:
         print(f"\n💰 CALCULATING PnL FROM TRADE PAIRS")
         print("=" * 50)
         
-        df = self.trades_df.copy()
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Group by strategy and symbol to match pairs
-        pnl_data = []
-        position_tracker = defaultdict(list)  # Track open positions
-        
-        for _, trade in df.iterrows():
-            symbol = trade['symbol']
-            strategy = trade['strategy_name']
-            action = trade['action']
-            price = trade['price']
-            quantity = trade['quantity']
-            timestamp = trade['timestamp']
-            
-            key = f"{strategy}_{symbol}"
-            
-            if action == 'LONG':
-                # Opening long position
-                position_tracker[key].append({
-                    'type': 'LONG',
-                    'entry_price': price,
-                    'quantity': quantity,
-                    'entry_time': timestamp,
-                    'trade_id': trade['id']
-                })
-                
-            elif action == 'SHORT':
-                # Closing long position (assuming SHORT means exit for long)
-                if key in position_tracker and position_tracker[key]:
-                    # Find matching long position (FIFO)
-                    for i, pos in enumerate(position_tracker[key]):
-                        if pos['type'] == 'LONG' and pos['quantity'] == quantity:
-                            # Calculate PnL
-                            entry_price = pos['entry_price']
-                            exit_price = price
-                            pnl = (exit_price - entry_price) * quantity
-                            
-                            # Calculate charges (approximate)
-                            trade_value = max(entry_price * quantity, exit_price * quantity)
-                            charges = trade_value * 0.001  # Approximate 0.1% charges
-                            net_pnl = pnl - charges
-                            
-                            pnl_record = {
-                                'strategy': strategy,
-                                'symbol': symbol,
-                                'entry_price': entry_price,
-                                'exit_price': exit_price,
-                                'quantity': quantity,
-                                'gross_pnl': pnl,
-                                'charges': charges,
-                                'net_pnl': net_pnl,
-                                'entry_time': pos['entry_time'],
-                                'exit_time': timestamp,
-                                'duration_minutes': (timestamp - pos['entry_time']).total_seconds() / 60,
-                                'entry_trade_id': pos['trade_id'],
-                                'exit_trade_id': trade['id']
-                            }
-                            
-                            pnl_data.append(pnl_record)
-                            
-                            # Remove the matched position
-                            position_tracker[key].pop(i)
-                            break
-        
-        self.calculated_pnl = pnl_data
-        print(f"✅ Calculated PnL for {len(pnl_data)} completed trades")
+        pnl_df = None
+        if sqlite3.sqlite_version_info >= (3, 25, 0):
+            try:
+                pnl_df, open_positions_count = pair_trades_sql(self.conn)
+            except sqlite3.Error as e:
+                print(f"⚠️ SQL pairing failed ({e}), matching in pandas")
+        
+        if pnl_df is None:
+            # trades_df timestamps are parsed on load and the matchers never mutate it
+            matcher = match_trade_pairs_jit if _compiled_fifo_kernel() is not None else match_trade_pairs
+            pnl_df, open_positions_count = matcher(self.trades_df)
+        
+        self._pnl_df = pnl_df
+        self._pnl_records = None
+        self._outcomes = None
+        self._net_pnl_by = {}
+        # Polars copy of the grouped columns, converted once per calculation
+        self._pnl_pl = pl.from_pandas(pnl_df[GROUPBY_COLUMNS]) if pl is not None else None
+        print(f"✅ Calculated PnL for {len(pnl_df)} completed trades")
         
         # Show open positions (unmatched LONG trades)
-        open_positions_count = sum(len(positions) for positions in position_tracker.values())
         print(f"📊 Open positions remaining: {open_positions_count}")
         
-        return pnl_data
+        return pnl_df
     
-    def analyze_pnl_performance(self):
+    def analyze_pnl_performance(self, out=None):
         """Comprehensive PnL analysis"""
-        if not self.calculated_pnl:
-            print("❌ No PnL data available. Run calculate_trade_pnl() first.")
+        if not self._has_pnl():
+            print("❌ No PnL data available. Run calculate_trade_pnl() first.", file=out)
             return
         
-        print(f"\n🎯 COMPREHENSIVE PnL ANALYSIS")
-        print("=" * 50)
+        print(f"\n🎯 COMPREHENSIVE PnL ANALYSIS", file=out)
+        print("=" * 50, file=out)
         
-        df = pd.DataFrame(self.calculated_pnl)
-        
-        if df.empty:
-            print("❌ No completed trades found for PnL analysis")
-            return
+        df = self._pnl_df
         
         # Basic statistics
         total_trades = len(df)
@@ -155,54 +458,51 @@ class SmartTradeAnalyzer:
         avg_net_pnl = df['net_pnl'].mean()
         
         # Win/Loss analysis
-        winning_trades = df[df['net_pnl'] > 0]
-        losing_trades = df[df['net_pnl'] < 0]
-        breakeven_trades = df[df['net_pnl'] == 0]
-        
-        win_count = len(winning_trades)
-        loss_count = len(losing_trades)
-        breakeven_count = len(breakeven_trades)
+        counts, sums = self._outcome_totals()
+        win_count = int(counts[WIN])
+        loss_count = int(counts[LOSS])
+        breakeven_count = int(counts[BREAKEVEN])
         
         win_rate = (win_count / total_trades) * 100 if total_trades > 0 else 0
         
         # Profit/Loss amounts
-        total_profits = winning_trades['net_pnl'].sum() if not winning_trades.empty else 0
-        total_losses = abs(losing_trades['net_pnl'].sum()) if not losing_trades.empty else 0
+        total_profits = sums[WIN] if win_count else 0
+        total_losses = abs(sums[LOSS]) if loss_count else 0
         
-        avg_win = winning_trades['net_pnl'].mean() if not winning_trades.empty else 0
-        avg_loss = abs(losing_trades['net_pnl'].mean()) if not losing_trades.empty else 0
+        avg_win = sums[WIN] / win_count if win_count else 0
+        avg_loss = abs(sums[LOSS] / loss_count) if loss_count else 0
         
         # Risk-reward ratio
         risk_reward_ratio = avg_win / avg_loss if avg_loss > 0 else 0
         
         # Display results
-        print(f"📊 OVERALL PERFORMANCE:")
-        print(f"   Total Completed Trades: {total_trades}")
-        print(f"   Total Gross PnL: ₹{total_gross_pnl:,.2f}")
-        print(f"   Total Charges: ₹{total_charges:,.2f}")
-        print(f"   Total Net PnL: ₹{total_net_pnl:,.2f}")
-        print(f"   Average Net PnL per trade: ₹{avg_net_pnl:,.2f}")
-        
-        print(f"\n🎯 WIN/LOSS BREAKDOWN:")
-        print(f"   Winning Trades: {win_count} ({win_rate:.1f}%)")
-        print(f"   Losing Trades: {loss_count} ({(loss_count/total_trades)*100:.1f}%)")
-        print(f"   Breakeven Trades: {breakeven_count} ({(breakeven_count/total_trades)*100:.1f}%)")
-        
-        print(f"\n💰 PROFIT/LOSS ANALYSIS:")
-        print(f"   Total Profits: ₹{total_profits:,.2f}")
-        print(f"   Total Losses: ₹{total_losses:,.2f}")
-        print(f"   Average Win: ₹{avg_win:,.2f}")
-        print(f"   Average Loss: ₹{avg_loss:,.2f}")
-        print(f"   Risk-Reward Ratio: {risk_reward_ratio:.2f}")
+        print(f"📊 OVERALL PERFORMANCE:", file=out)
+        print(f"   Total Completed Trades: {total_trades}", file=out)
+        print(f"   Total Gross PnL: ₹{total_gross_pnl:,.2f}", file=out)
+        print(f"   Total Charges: ₹{total_charges:,.2f}", file=out)
+        print(f"   Total Net PnL: ₹{total_net_pnl:,.2f}", file=out)
+        print(f"   Average Net PnL per trade: ₹{avg_net_pnl:,.2f}", file=out)
+        
+        print(f"\n🎯 WIN/LOSS BREAKDOWN:", file=out)
+        print(f"   Winning Trades: {win_count} ({win_rate:.1f}%)", file=out)
+        print(f"   Losing Trades: {loss_count} ({(loss_count/total_trades)*100:.1f}%)", file=out)
+        print(f"   Breakeven Trades: {breakeven_count} ({(breakeven_count/total_trades)*100:.1f}%)", file=out)
+        
+        print(f"\n💰 PROFIT/LOSS ANALYSIS:", file=out)
+        print(f"   Total Profits: ₹{total_profits:,.2f}", file=out)
+        print(f"   Total Losses: ₹{total_losses:,.2f}", file=out)
+        print(f"   Average Win: ₹{avg_win:,.2f}", file=out)
+        print(f"   Average Loss: ₹{avg_loss:,.2f}", file=out)
+        print(f"   Risk-Reward Ratio: {risk_reward_ratio:.2f}", file=out)
         
         if risk_reward_ratio < 1.0:
-            print(f"   ⚠️ WARNING: Average losses exceed average wins!")
+            print(f"   ⚠️ WARNING: Average losses exceed average wins!", file=out)
         
         if win_rate < 50:
-            print(f"   ⚠️ WARNING: Win rate below 50%!")
+            print(f"   ⚠️ WARNING: Win rate below 50%!", file=out)
         
         if total_net_pnl < 0:
-            print(f"   🚨 CRITICAL: Overall PnL is NEGATIVE!")
+            print(f"   🚨 CRITICAL: Overall PnL is NEGATIVE!", file=out)
         
         return {
             'total_trades': total_trades,
@@ -215,128 +515,155 @@ class SmartTradeAnalyzer:
             'total_losses': total_losses
         }
     
-    def strategy_performance(self):
+    def strategy_performance(self, out=None):
         """Analyze performance by strategy"""
-        if not self.calculated_pnl:
+        if not self._has_pnl():
             return
         
-        print(f"\n📈 STRATEGY-WISE PERFORMANCE")
-        print("=" * 50)
-        
-        df = pd.DataFrame(self.calculated_pnl)
-        
-        strategy_stats = df.groupby('strategy').agg({
-            'net_pnl': ['count', 'sum', 'mean'],
-            'gross_pnl': 'sum',
-            'charges': 'sum'
-        }).round(2)
-        
-        strategy_stats.columns = ['Trades', 'Net_PnL', 'Avg_PnL', 'Gross_PnL', 'Charges']
-        
-        # Calculate win rates by strategy
-        for strategy in df['strategy'].unique():
-            strategy_trades = df[df['strategy'] == strategy]
-            wins = len(strategy_trades[strategy_trades['net_pnl'] > 0])
-            total = len(strategy_trades)
-            win_rate = (wins / total) * 100 if total > 0 else 0
-            strategy_stats.loc[strategy, 'Win_Rate'] = win_rate
+        print(f"\n📈 STRATEGY-WISE PERFORMANCE", file=out)
+        print("=" * 50, file=out)
+        
+        df = self._pnl_df
+        
+        if self._pnl_pl is not None:
+            strategy_stats = (
+                self._pnl_pl.group_by('strategy')
+                .agg([
+                    pl.len().alias('Trades'),
+                    pl.col('net_pnl').sum(),
+                    pl.col('net_pnl').sum().round(2).alias('Net_PnL'),
+                    pl.col('net_pnl').mean().round(2).alias('Avg_PnL'),
+                    pl.col('gross_pnl').sum().round(2).alias('Gross_PnL'),
+                    pl.col('charges').sum().round(2).alias('Charges'),
+                    ((pl.col('net_pnl') > 0).mean() * 100).alias('Win_Rate'),
+                ])
+                .sort('strategy')
+                .to_pandas()
+                .set_index('strategy')
+            )
+            self._net_pnl_by['strategy'] = strategy_stats.pop('net_pnl')
+        else:
+            strategy_stats = df.groupby('strategy', observed=True).agg({
+                'net_pnl': ['count', 'sum', 'mean'],
+                'gross_pnl': 'sum',
+                'charges': 'sum'
+            })
+            
+            strategy_stats.columns = ['Trades', 'Net_PnL', 'Avg_PnL', 'Gross_PnL', 'Charges']
+            self._net_pnl_by['strategy'] = strategy_stats['Net_PnL']
+            strategy_stats = strategy_stats.round(2)
+            
+            # Win rate by strategy: share of trades with positive net PnL
+            strategy_stats['Win_Rate'] = (df['net_pnl'] > 0).groupby(df['strategy'], observed=True).mean() * 100
         
-        print(strategy_stats.sort_values('Net_PnL', ascending=False))
+        print(strategy_stats.sort_values('Net_PnL', ascending=False), file=out)
         
         return strategy_stats
     
-    def symbol_performance(self):
+    def symbol_performance(self, out=None):
         """Analyze performance by symbol"""
-        if not self.calculated_pnl:
+        if not self._has_pnl():
             return
         
-        print(f"\n📊 SYMBOL-WISE PERFORMANCE")
-        print("=" * 50)
-        
-        df = pd.DataFrame(self.calculated_pnl)
-        
-        symbol_stats = df.groupby('symbol').agg({
-            'net_pnl': ['count', 'sum', 'mean'],
-            'duration_minutes': 'mean'
-        }).round(2)
-        
-        symbol_stats.columns = ['Trades', 'Total_PnL', 'Avg_PnL', 'Avg_Duration_Min']
+        print(f"\n📊 SYMBOL-WISE PERFORMANCE", file=out)
+        print("=" * 50, file=out)
+        
+        if self._pnl_pl is not None:
+            symbol_stats = (
+                self._pnl_pl.group_by('symbol')
+                .agg([
+                    pl.len().alias('Trades'),
+                    pl.col('net_pnl').sum(),
+                    pl.col('net_pnl').sum().round(2).alias('Total_PnL'),
+                    pl.col('net_pnl').mean().round(2).alias('Avg_PnL'),
+                    pl.col('duration_minutes').mean().round(2).alias('Avg_Duration_Min'),
+                ])
+                .sort('symbol')
+                .to_pandas()
+                .set_index('symbol')
+            )
+            self._net_pnl_by['symbol'] = symbol_stats.pop('net_pnl')
+        else:
+            symbol_stats = self._pnl_df.groupby('symbol', observed=True).agg({
+                'net_pnl': ['count', 'sum', 'mean'],
+                'duration_minutes': 'mean'
+            })
+            
+            symbol_stats.columns = ['Trades', 'Total_PnL', 'Avg_PnL', 'Avg_Duration_Min']
+            self._net_pnl_by['symbol'] = symbol_stats['Total_PnL']
+            symbol_stats = symbol_stats.round(2)
         
         # Sort by total PnL
         symbol_stats = symbol_stats.sort_values('Total_PnL', ascending=False)
         
-        print("🏆 TOP PERFORMING SYMBOLS:")
-        print(symbol_stats.head(10))
+        print("🏆 TOP PERFORMING SYMBOLS:", file=out)
+        print(symbol_stats.head(10), file=out)
         
-        print("\n📉 WORST PERFORMING SYMBOLS:")
-        print(symbol_stats.tail(10))
+        print("\n📉 WORST PERFORMING SYMBOLS:", file=out)
+        print(symbol_stats.tail(10), file=out)
         
         return symbol_stats
     
-    def identify_loss_patterns(self):
+    def identify_loss_patterns(self, out=None):
         """Identify patterns in losing trades"""
-        if not self.calculated_pnl:
+        if not self._has_pnl():
             return
         
-        print(f"\n🔍 LOSS PATTERN ANALYSIS")
-        print("=" * 50)
+        print(f"\n🔍 LOSS PATTERN ANALYSIS", file=out)
+        print("=" * 50, file=out)
         
-        df = pd.DataFrame(self.calculated_pnl)
-        losing_trades = df[df['net_pnl'] < 0]
+        counts, sums = self._outcome_totals()
+        loss_count = int(counts[LOSS])
         
-        if losing_trades.empty:
-            print("✅ No losing trades found!")
+        if not loss_count:
+            print("✅ No losing trades found!", file=out)
             return
         
-        total_losses = abs(losing_trades['net_pnl'].sum())
-        avg_loss = abs(losing_trades['net_pnl'].mean())
-        max_loss = abs(losing_trades['net_pnl'].min())
+        total_losses = abs(sums[LOSS])
+        avg_loss = abs(sums[LOSS] / loss_count)
+        max_loss = abs(self._pnl_df['net_pnl'].min())
         
-        print(f"📊 Total losing trades: {len(losing_trades)}")
-        print(f"💸 Total losses: ₹{total_losses:,.2f}")
-        print(f"📉 Average loss: ₹{avg_loss:,.2f}")
-        print(f"📉 Maximum single loss: ₹{max_loss:,.2f}")
+        print(f"📊 Total losing trades: {loss_count}", file=out)
+        print(f"💸 Total losses: ₹{total_losses:,.2f}", file=out)
+        print(f"📉 Average loss: ₹{avg_loss:,.2f}", file=out)
+        print(f"📉 Maximum single loss: ₹{max_loss:,.2f}", file=out)
         
         # Loss by strategy
-        loss_by_strategy = losing_trades.groupby('strategy')['net_pnl'].agg(['count', 'sum']).round(2)
-        loss_by_strategy.columns = ['Loss_Count', 'Total_Loss']
-        loss_by_strategy['Total_Loss'] = abs(loss_by_strategy['Total_Loss'])
+        loss_by_strategy = self._loss_table('strategy')
         
-        print(f"\n📉 LOSSES BY STRATEGY:")
-        print(loss_by_strategy.sort_values('Total_Loss', ascending=False))
+        print(f"\n📉 LOSSES BY STRATEGY:", file=out)
+        print(loss_by_strategy.sort_values('Total_Loss', ascending=False), file=out)
         
         # Loss by symbol
-        loss_by_symbol = losing_trades.groupby('symbol')['net_pnl'].agg(['count', 'sum']).round(2)
-        loss_by_symbol.columns = ['Loss_Count', 'Total_Loss']
-        loss_by_symbol['Total_Loss'] = abs(loss_by_symbol['Total_Loss'])
+        loss_by_symbol = self._loss_table('symbol')
         
-        print(f"\n📉 WORST PERFORMING SYMBOLS (LOSSES):")
-        print(loss_by_symbol.sort_values('Total_Loss', ascending=False).head(10))
+        print(f"\n📉 WORST PERFORMING SYMBOLS (LOSSES):", file=out)
+        print(loss_by_symbol.sort_values('Total_Loss', ascending=False).head(10), file=out)
         
         return {
-            'total_losing_trades': len(losing_trades),
+            'total_losing_trades': loss_count,
             'total_losses': total_losses,
             'avg_loss': avg_loss,
             'max_loss': max_loss
         }
     
-    def generate_recommendations(self):
+    def generate_recommendations(self, out=None):
         """Generate actionable recommendations"""
-        if not self.calculated_pnl:
+        if not self._has_pnl():
             return []
         
-        df = pd.DataFrame(self.calculated_pnl)
+        counts, sums = self._outcome_totals()
         
-        total_pnl = df['net_pnl'].sum()
-        win_rate = (len(df[df['net_pnl'] > 0]) / len(df)) * 100
-        avg_win = df[df['net_pnl'] > 0]['net_pnl'].mean() if len(df[df['net_pnl'] > 0]) > 0 else 0
-        avg_loss = abs(df[df['net_pnl'] < 0]['net_pnl'].mean()) if len(df[df['net_pnl'] < 0]) > 0 else 0
+        total_pnl = sums.sum()
+        win_rate = (counts[WIN] / counts.sum()) * 100
+        avg_win = sums[WIN] / counts[WIN] if counts[WIN] > 0 else 0
+        avg_loss = abs(sums[LOSS] / counts[LOSS]) if counts[LOSS] > 0 else 0
         rr_ratio = avg_win / avg_loss if avg_loss > 0 else 0
         
         recommendations = []
         
-        print(f"\n🎯 ACTIONABLE RECOMMENDATIONS")
-        print("=" * 50)
+        print(f"\n🎯 ACTIONABLE RECOMMENDATIONS", file=out)
+        print("=" * 50, file=out)
         
         if total_pnl < 0:
             recommendations.append("🚨 URGENT: Overall PnL is negative. Review complete strategy logic.")
@@ -350,8 +677,8 @@ class SmartTradeAnalyzer:
         if avg_loss > 100:
             recommendations.append("🛑 Consider reducing position sizes to limit large losses.")
             
-        # Strategy-specific recommendations
-        strategy_performance = df.groupby('strategy')['net_pnl'].sum()
+        # Strategy-specific recommendations (sums cached by strategy_performance)
+        strategy_performance = self._net_by('strategy')
         worst_strategy = strategy_performance.idxmin()
         worst_pnl = strategy_performance.min()
         
@@ -359,7 +686,7 @@ class SmartTradeAnalyzer:
             recommendations.append(f"⚠️ Strategy '{worst_strategy}' showing major losses (₹{abs(worst_pnl):,.2f}). Consider disabling.")
         
         # Symbol-specific recommendations
-        symbol_performance = df.groupby('symbol')['net_pnl'].sum()
+        symbol_performance = self._net_by('symbol')
         worst_symbols = symbol_performance[symbol_performance < -200].index.tolist()
         
         if worst_symbols:
@@ -373,7 +700,7 @@ class SmartTradeAnalyzer:
             recommendations.append("🔧 Consider implementing dynamic position sizing based on recent performance.")
         
         for i, rec in enumerate(recommendations, 1):
-            print(f"{i}. {rec}")
+            print(f"{i}. {rec}", file=out)
         
         return recommendations
     
@@ -387,32 +714,46 @@ class SmartTradeAnalyzer:
             return
         
         # Calculate PnL
-        pnl_data = self.calculate_trade_pnl()
+        pnl_df = self.calculate_trade_pnl()
         
-        if not pnl_data:
+        if pnl_df.empty:
             print("❌ No completed trades found for analysis")
             return
         
-        # Run all analyses
-        overall_performance = self.analyze_pnl_performance()
-        strategy_performance = self.strategy_performance()
-        symbol_performance = self.symbol_performance()
-        loss_patterns = self.identify_loss_patterns()
-        recommendations = self.generate_recommendations()
-        
-        # Save detailed report
+        # The four analyses only read the PnL frame, so they run concurrently
+        # (numpy/pandas/polars release the GIL); each prints into its own buffer
+        analyses = (
+            self.analyze_pnl_performance,
+            self.strategy_performance,
+            self.symbol_performance,
+            self.identify_loss_patterns,
+        )
+        buffers = [io.StringIO() for _ in analyses]
+        with ThreadPoolExecutor(max_workers=len(analyses)) as pool:
+            futures = [pool.submit(analysis, buf) for analysis, buf in zip(analyses, buffers)]
+            overall_performance, strategy_performance, symbol_performance, loss_patterns = (
+                future.result() for future in futures
+            )
+        
+        # Recommendations reuse the strategy/symbol sums cached above
+        buffers.append(io.StringIO())
+        recommendations = self.generate_recommendations(buffers[-1])
+        sys.stdout.write(''.join(buf.getvalue() for buf in buffers))
+        
+        # Save detailed report; per-trade rows go to a JSONL sidecar
         report = {
             'timestamp': datetime.now().isoformat(),
-            'total_trades_analyzed': len(pnl_data),
+            'total_trades_analyzed': len(pnl_df),
             'overall_performance': overall_performance,
-            'detailed_trades': pnl_data,
+            'detailed_trades_file': TRADES_FILE,
             'recommendations': recommendations
         }
         
-        with open('comprehensive_trade_report.json', 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        with open(REPORT_FILE, 'wb') as f:
+            f.write(_json_dumps(report))
+        self.export_trades_jsonl(TRADES_FILE)
         
-        print(f"\n💾 Detailed report saved to: comprehensive_trade_report.json")
+        print(f"\n💾 Detailed report saved to: {REPORT_FILE} (trades: {TRADES_FILE})")
         
         # Summary
         print(f"\n📋 EXECUTIVE SUMMARY")
@@ -426,9 +767,6 @@ class SmartTradeAnalyzer:
             else:
                 print(f"❌ Loss-making: ₹{abs(net_pnl):,.2f} loss with {win_rate:.1f}% win rate")
                 print(f"🔥 IMMEDIATE ACTION REQUIRED!")
-        
-        if self.conn:
-            self.conn.close()
 
 def main():
     """Main execution"""
@@ -4,13 +4,73 @@ COMPREHENSIVE TRADE ANALYSIS
 Analyze trade database to understand PnL patterns, win/loss ratios, and performance issues
 """
 
+import os
 import sqlite3
+import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 import json
 
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        # Hourly tables are keyed by int hour, which orjson only takes with NON_STR_KEYS
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=str,
+        )
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, default=str, ensure_ascii=False).encode()
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from db_connection import get_conn
+
+# Above this many rows the structure dump reports MAX(rowid) instead of a COUNT(*) scan
+EXACT_COUNT_LIMIT = 10_000_000
+SAMPLE_ROWS = 3
+
+# Tables tried in order when looking for the trade log
+TRADE_TABLES = ['trades', 'trade_log', 'trading_log', 'positions']
+
+def _quote(name: str) -> str:
+    """Quote a table/column name for use in SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _numeric(column: str) -> str:
+    """SQL for a column's numeric values, NULL otherwise (pd.to_numeric(errors='coerce'))"""
+    col = _quote(column)
+    return f"(CASE WHEN typeof({col}) IN ('integer', 'real') THEN {col} END)"
+
+def _write_json(f, obj, indent: int = 0):
+    """
+    Write obj as indented JSON to the text file f.
+    
+    DataFrame/Series values are written by pandas' to_json straight into the file
+    (same layout as to_dict), so the aggregate tables never become dict trees.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        obj.to_json(f)
+    elif isinstance(obj, dict) and any(isinstance(value, (pd.DataFrame, pd.Series, dict)) for value in obj.values()):
+        pad = ' ' * (indent + 2)
+        f.write('{')
+        for i, (key, value) in enumerate(obj.items()):
+            f.write(f'{"," if i else ""}\n{pad}{json.dumps(str(key))}: ')
+            _write_json(f, value, indent + 2)
+        f.write('\n' + ' ' * indent + '}')
+    else:
+        f.write(_json_dumps(obj).decode().replace('\n', '\n' + ' ' * indent))
+
+def _find_column(columns: List[str], *needles: str):
+    """First column whose lower-cased name contains any of the needles, else None"""
+    return next((col for col in columns if any(needle in col.lower() for needle in needles)), None)
+
 class TradeAnalyzer:
     """
     Comprehensive trade analysis system to identify performance issues
@@ -19,61 +79,117 @@ class TradeAnalyzer:
     def __init__(self, db_path: str = 'trading_data.db'):
         self.db_path = db_path
         self.conn = None
-        self.trades_df = None
+        self.table = None
+        self.columns = []
+        self.trade_count = 0
+        # Column roles, resolved once from the schema in load_trades_data
+        self._pnl_col = None
+        self._strategy_col = None
+        self._symbol_col = None
+        self._time_col = None
         
     def connect_db(self):
-        """Connect to trading database"""
+        """Connect to trading database, reusing the connection once open"""
+        if self.conn is not None:
+            return True
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = get_conn(self.db_path)
             print(f"✅ Connected to database: {self.db_path}")
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
             return False
     
-    def load_trades_data(self) -> pd.DataFrame:
-        """Load all trades data from database"""
+    def load_trades_data(self) -> int:
+        """
+        Locate the trade log table and count its rows.
+        
+        Rows are not loaded: each analysis pushes its grouping into SQL and only
+        the aggregated rows come back (see _agg).
+        """
         if not self.connect_db():
-            return pd.DataFrame()
+            return 0
         
-        try:
-            # Get table structure first
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            print(f"📊 Available tables: {[table[0] for table in tables]}")
-            
-            # Try to load trades data
-            query = """
-            SELECT * FROM trades 
-            ORDER BY timestamp DESC
-            """
-            
-            self.trades_df = pd.read_sql_query(query, self.conn)
-            print(f"📈 Loaded {len(self.trades_df)} trade records")
-            
-            return self.trades_df
-            
-        except Exception as e:
-            print(f"❌ Error loading trades data: {e}")
-            
-            # Try alternative table names
-            alternative_queries = [
-                "SELECT * FROM trade_log ORDER BY timestamp DESC",
-                "SELECT * FROM trading_log ORDER BY timestamp DESC",
-                "SELECT * FROM positions ORDER BY timestamp DESC"
-            ]
-            
-            for query in alternative_queries:
-                try:
-                    self.trades_df = pd.read_sql_query(query, self.conn)
-                    print(f"✅ Loaded data from alternative query: {len(self.trades_df)} records")
-                    return self.trades_df
-                except:
-                    continue
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        tables = [table[0] for table in cursor.fetchall()]
+        print(f"📊 Available tables: {tables}")
+        
+        for table in TRADE_TABLES:
+            columns = [col[1] for col in cursor.execute(f"PRAGMA table_info({_quote(table)})")]
+            if 'timestamp' not in columns:
+                continue
             
-            print("❌ Could not load trade data from any table")
-            return pd.DataFrame()
+            self.table = _quote(table)
+            self.columns = columns
+            self._pnl_col = _find_column(columns, 'pnl')
+            self._strategy_col = _find_column(columns, 'strategy')
+            self._symbol_col = _find_column(columns, 'symbol', 'stock')
+            self._time_col = _find_column(columns, 'time', 'date')
+            self._ensure_indexes(table)
+            self.trade_count = cursor.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            if table == TRADE_TABLES[0]:
+                print(f"📈 Loaded {self.trade_count} trade records")
+            else:
+                print(f"✅ Loaded data from alternative table {table}: {self.trade_count} records")
+            return self.trade_count
+        
+        print("❌ Could not load trade data from any table")
+        return 0
+    
+    def _ensure_indexes(self, table: str):
+        """
+        Covering indexes for the strategy/symbol/loss aggregations.
+        
+        Entry legs carry no realized PnL, so the pnl index is partial over closed
+        trades only; the loss and median queries filter on the raw column, which
+        lets SQLite prove the "IS NOT NULL" predicate and use it.
+        """
+        pnl_col, strategy_col, symbol_col = self._pnl_col, self._strategy_col, self._symbol_col
+        if pnl_col is None:
+            return
+        
+        # suffix -> (columns, partial-index predicate)
+        indexes = {
+            'closed_pnl': ([pnl_col], f"{_quote(pnl_col)} IS NOT NULL"),
+            'ts_pnl': (['timestamp', pnl_col], None),
+        }
+        if strategy_col:
+            indexes['strategy_ts_pnl'] = ([strategy_col, 'timestamp', pnl_col], None)
+        if symbol_col:
+            indexes['symbol_pnl'] = ([symbol_col, pnl_col], None)
+        
+        try:
+            with self.conn:
+                for suffix, (columns, where) in indexes.items():
+                    self.conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{suffix}')} "
+                        f"ON {_quote(table)}({', '.join(_quote(col) for col in columns)})"
+                        + (f" WHERE {where}" if where else "")
+                    )
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ Could not create analysis indexes: {e}")
+    
+    def _agg(self, sql: str, params=()) -> pd.DataFrame:
+        """Run an aggregation over the trade table; only the grouped rows come back"""
+        return pd.read_sql_query(sql, self.conn, params=params)
+    
+    def _median(self, expr: str, where: str) -> float:
+        """Median of expr over the rows matching where, via ORDER BY ... LIMIT/OFFSET"""
+        count = self.conn.execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {where}"
+        ).fetchone()[0]
+        if count == 0:
+            return np.nan
+        middle = self.conn.execute(
+            f"SELECT {expr} FROM {self.table} WHERE {where} ORDER BY {expr} LIMIT ? OFFSET ?",
+            (2 - count % 2, (count - 1) // 2)
+        ).fetchall()
+        return float(np.mean([row[0] for row in middle]))
+    
+    def _has_trades(self) -> bool:
+        """True once load_trades_data found a non-empty trade table"""
+        return self.table is not None and self.trade_count > 0
     
     def analyze_database_structure(self):
         """Analyze database structure to understand available data"""
@@ -94,39 +210,46 @@ class TradeAnalyzer:
             print(f"\n📊 Table: {table}")
             
             # Get table schema
-            cursor.execute(f"PRAGMA table_info({table})")
+            cursor.execute(f"PRAGMA table_info({_quote(table)})")
             columns = cursor.fetchall()
             
             print("   Columns:")
             for col in columns:
                 print(f"     • {col[1]} ({col[2]})")
             
-            # Get row count
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
-            print(f"   Records: {count}")
+            # Get row count: MAX(rowid) is a b-tree seek and bounds the count, so
+            # only tables that could be huge skip the exact COUNT(*) scan
+            try:
+                max_rowid = cursor.execute(f"SELECT MAX(rowid) FROM {_quote(table)}").fetchone()[0] or 0
+            except sqlite3.OperationalError:  # WITHOUT ROWID table
+                max_rowid = 0
+            if max_rowid >= EXACT_COUNT_LIMIT:
+                count = max_rowid
+                print(f"   Records: ~{count} (max rowid)")
+            else:
+                cursor.execute(f"SELECT COUNT(*) FROM {_quote(table)}")
+                count = cursor.fetchone()[0]
+                print(f"   Records: {count}")
             
             # Show sample data if exists
             if count > 0:
-                cursor.execute(f"SELECT * FROM {table} LIMIT 3")
-                sample_data = cursor.fetchall()
+                cursor.execute(f"SELECT * FROM {_quote(table)} LIMIT {SAMPLE_ROWS}")
+                sample_data = cursor.fetchmany(SAMPLE_ROWS)
                 print("   Sample data:")
                 for i, row in enumerate(sample_data):
                     print(f"     Row {i+1}: {row}")
     
     def comprehensive_pnl_analysis(self) -> Dict:
         """Comprehensive PnL analysis"""
-        if self.trades_df is None or self.trades_df.empty:
+        if not self._has_trades():
             print("❌ No trade data available for analysis")
             return {}
         
         print("\n💰 COMPREHENSIVE PnL ANALYSIS")
         print("=" * 50)
         
-        df = self.trades_df.copy()
-        
         # Identify PnL column
-        pnl_columns = [col for col in df.columns if 'pnl' in col.lower() or 'profit' in col.lower() or 'loss' in col.lower()]
+        pnl_columns = [col for col in self.columns if 'pnl' in col.lower() or 'profit' in col.lower() or 'loss' in col.lower()]
         print(f"🔍 Potential PnL columns: {pnl_columns}")
         
         if not pnl_columns:
@@ -137,32 +260,40 @@ class TradeAnalyzer:
         pnl_col = pnl_columns[0]
         print(f"📊 Using PnL column: {pnl_col}")
         
-        # Convert to numeric if needed
-        df[pnl_col] = pd.to_numeric(df[pnl_col], errors='coerce')
-        
-        # Basic PnL statistics
-        total_pnl = df[pnl_col].sum()
-        avg_pnl = df[pnl_col].mean()
-        median_pnl = df[pnl_col].median()
-        
-        # Win/Loss analysis
-        winning_trades = df[df[pnl_col] > 0]
-        losing_trades = df[df[pnl_col] < 0]
-        breakeven_trades = df[df[pnl_col] == 0]
-        
-        total_trades = len(df)
-        winning_count = len(winning_trades)
-        losing_count = len(losing_trades)
-        breakeven_count = len(breakeven_trades)
+        # Basic statistics and the win/loss split in one pass over the table
+        pnl_sql = _numeric(pnl_col)
+        stats = self._agg(f"""
+            SELECT COUNT(*) AS total_trades,
+                   TOTAL({pnl_sql}) AS total_pnl,
+                   AVG({pnl_sql}) AS avg_pnl,
+                   COUNT(CASE WHEN {pnl_sql} > 0 THEN 1 END) AS winning_count,
+                   COUNT(CASE WHEN {pnl_sql} < 0 THEN 1 END) AS losing_count,
+                   COUNT(CASE WHEN {pnl_sql} = 0 THEN 1 END) AS breakeven_count,
+                   TOTAL(CASE WHEN {pnl_sql} > 0 THEN {pnl_sql} END) AS total_profits,
+                   TOTAL(CASE WHEN {pnl_sql} < 0 THEN {pnl_sql} END) AS total_losses,
+                   AVG(CASE WHEN {pnl_sql} > 0 THEN {pnl_sql} END) AS avg_win,
+                   AVG(CASE WHEN {pnl_sql} < 0 THEN {pnl_sql} END) AS avg_loss
+            FROM {self.table}
+        """).iloc[0]
+        
+        total_trades = int(stats['total_trades'])
+        total_pnl = stats['total_pnl']
+        avg_pnl = stats['avg_pnl']
+        # Ordering by the raw column walks the pnl index; the filter keeps numbers only
+        median_pnl = self._median(_quote(pnl_col), f"{_quote(pnl_col)} IS NOT NULL AND {pnl_sql} IS NOT NULL")
+        
+        winning_count = int(stats['winning_count'])
+        losing_count = int(stats['losing_count'])
+        breakeven_count = int(stats['breakeven_count'])
         
         win_rate = (winning_count / total_trades) * 100 if total_trades > 0 else 0
         
         # Profit/Loss amounts
-        total_profits = winning_trades[pnl_col].sum() if not winning_trades.empty else 0
-        total_losses = losing_trades[pnl_col].sum() if not losing_trades.empty else 0
+        total_profits = stats['total_profits'] if winning_count else 0
+        total_losses = stats['total_losses'] if losing_count else 0
         
-        avg_win = winning_trades[pnl_col].mean() if not winning_trades.empty else 0
-        avg_loss = losing_trades[pnl_col].mean() if not losing_trades.empty else 0
+        avg_win = stats['avg_win'] if winning_count else 0
+        avg_loss = stats['avg_loss'] if losing_count else 0
         
         # Risk-reward ratio
         risk_reward_ratio = abs(avg_win / avg_loss) if avg_loss != 0 else 0
@@ -206,40 +337,39 @@ class TradeAnalyzer:
     
     def strategy_wise_analysis(self) -> Dict:
         """Analyze performance by strategy"""
-        if self.trades_df is None or self.trades_df.empty:
+        if not self._has_trades():
             return {}
         
         print("\n🎯 STRATEGY-WISE ANALYSIS")
         print("=" * 50)
         
-        df = self.trades_df.copy()
-        
-        # Find strategy column
-        strategy_columns = [col for col in df.columns if 'strategy' in col.lower()]
-        
-        if not strategy_columns:
+        if not self._strategy_col:
             print("❌ No strategy column found")
             return {}
         
-        strategy_col = strategy_columns[0]
-        pnl_col = [col for col in df.columns if 'pnl' in col.lower()][0]
+        if not self._pnl_col:
+            print("❌ No PnL column found")
+            return {}
+        
+        strategy_col = _quote(self._strategy_col)
+        pnl_sql = _numeric(self._pnl_col)
+        
+        # Group by strategy, most recently traded first
+        by_strategy = self._agg(f"""
+            SELECT {strategy_col} AS strategy,
+                   COUNT(*) AS total_trades,
+                   TOTAL({pnl_sql}) AS total_pnl,
+                   COUNT(CASE WHEN {pnl_sql} > 0 THEN 1 END) * 100.0 / COUNT(*) AS win_rate,
+                   AVG({pnl_sql}) AS avg_pnl
+            FROM {self.table}
+            WHERE {strategy_col} IS NOT NULL
+            GROUP BY {strategy_col}
+            ORDER BY MAX(timestamp) DESC
+        """)
         
-        # Group by strategy
         strategy_analysis = {}
         
-        for strategy in df[strategy_col].unique():
-            strategy_trades = df[df[strategy_col] == strategy]
-            
-            if strategy_trades.empty:
-                continue
-            
-            pnl_data = pd.to_numeric(strategy_trades[pnl_col], errors='coerce')
-            
-            total_trades = len(strategy_trades)
-            total_pnl = pnl_data.sum()
-            win_rate = (len(pnl_data[pnl_data > 0]) / total_trades) * 100
-            avg_pnl = pnl_data.mean()
-            
+        for strategy, total_trades, total_pnl, win_rate, avg_pnl in by_strategy.itertuples(index=False):
             strategy_analysis[strategy] = {
                 'total_trades': total_trades,
                 'total_pnl': total_pnl,
@@ -257,128 +387,171 @@ class TradeAnalyzer:
     
     def symbol_wise_analysis(self) -> Dict:
         """Analyze performance by symbol"""
-        if self.trades_df is None or self.trades_df.empty:
+        if not self._has_trades():
             return {}
         
         print("\n📊 SYMBOL-WISE ANALYSIS")
         print("=" * 50)
         
-        df = self.trades_df.copy()
-        
-        # Find symbol column
-        symbol_columns = [col for col in df.columns if 'symbol' in col.lower() or 'stock' in col.lower()]
-        
-        if not symbol_columns:
+        if not self._symbol_col:
             print("❌ No symbol column found")
             return {}
         
-        symbol_col = symbol_columns[0]
-        pnl_col = [col for col in df.columns if 'pnl' in col.lower()][0]
-        
-        # Group by symbol
-        symbol_analysis = df.groupby(symbol_col).agg({
-            pnl_col: ['count', 'sum', 'mean']
-        }).round(2)
+        if not self._pnl_col:
+            print("❌ No PnL column found")
+            return {}
         
-        symbol_analysis.columns = ['Total_Trades', 'Total_PnL', 'Avg_PnL']
-        symbol_analysis = symbol_analysis.sort_values('Total_PnL', ascending=False)
+        symbol_col = _quote(self._symbol_col)
+        pnl_sql = _numeric(self._pnl_col)
+        
+        # Only the two ends of the ranking are shown, so SQLite sorts and cuts
+        # them off instead of returning every symbol's aggregate
+        ranking = f"""
+            SELECT {symbol_col} AS {symbol_col},
+                   COUNT({pnl_sql}) AS Total_Trades,
+                   TOTAL({pnl_sql}) AS Total_PnL,
+                   AVG({pnl_sql}) AS Avg_PnL
+            FROM {self.table}
+            WHERE {symbol_col} IS NOT NULL
+            GROUP BY {symbol_col}
+            ORDER BY Total_PnL {{}}, {symbol_col} {{}}
+            LIMIT 10
+        """
+        top_symbols = self._agg(ranking.format('DESC', 'ASC')).set_index(self._symbol_col).round(2)
+        # Fetched worst-first, shown in the same descending order as the top table
+        worst_symbols = self._agg(ranking.format('ASC', 'DESC')).iloc[::-1].set_index(self._symbol_col).round(2)
         
         print("\n🏆 TOP PERFORMING SYMBOLS:")
-        print(symbol_analysis.head(10))
+        print(top_symbols)
         
         print("\n📉 WORST PERFORMING SYMBOLS:")
-        print(symbol_analysis.tail(10))
+        print(worst_symbols)
         
-        return symbol_analysis.to_dict()
+        return {
+            'top_symbols': top_symbols,
+            'worst_symbols': worst_symbols
+        }
     
     def time_based_analysis(self) -> Dict:
         """Analyze performance by time periods"""
-        if self.trades_df is None or self.trades_df.empty:
+        if not self._has_trades():
             return {}
         
         print("\n⏰ TIME-BASED ANALYSIS")
         print("=" * 50)
         
-        df = self.trades_df.copy()
-        
-        # Find timestamp column
-        time_columns = [col for col in df.columns if 'time' in col.lower() or 'date' in col.lower()]
-        
-        if not time_columns:
+        if not self._time_col:
             print("❌ No timestamp column found")
             return {}
         
-        time_col = time_columns[0]
-        pnl_col = [col for col in df.columns if 'pnl' in col.lower()][0]
+        if not self._pnl_col:
+            print("❌ No PnL column found")
+            return {}
+        
+        time_col = _quote(self._time_col)
+        pnl_sql = _numeric(self._pnl_col)
         
-        # Convert timestamp
-        df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
-        df['date'] = df[time_col].dt.date
-        df['hour'] = df[time_col].dt.hour
+        # ISO timestamps carry the local (IST) date and hour in fixed positions;
+        # SQLite's date()/strftime() would shift them to UTC
+        day = f"substr({time_col}, 1, 10)"
+        hour = f"CAST(substr({time_col}, 12, 2) AS INTEGER)"
+        is_timestamp = f"{time_col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
         
         # Daily analysis
-        daily_pnl = df.groupby('date')[pnl_col].sum().sort_index()
+        daily_pnl = self._agg(f"""
+            SELECT {day} AS date, TOTAL({pnl_sql}) AS pnl
+            FROM {self.table}
+            WHERE {is_timestamp}
+            GROUP BY date
+            ORDER BY date
+        """).set_index('date')['pnl']
         
         print(f"\n📅 DAILY PnL (Last 10 days):")
-        for date, pnl in daily_pnl.tail(10).items():
-            print(f"   {date}: ₹{pnl:,.2f}")
+        recent_days = daily_pnl.tail(10)
+        if not recent_days.empty:
+            print("\n".join(f"   {date}: ₹{pnl:,.2f}" for date, pnl in recent_days.items()))
         
         # Hourly analysis
-        hourly_pnl = df.groupby('hour')[pnl_col].agg(['count', 'sum', 'mean']).round(2)
-        hourly_pnl.columns = ['Trades', 'Total_PnL', 'Avg_PnL']
+        hourly_pnl = self._agg(f"""
+            SELECT {hour} AS hour,
+                   COUNT({pnl_sql}) AS Trades,
+                   TOTAL({pnl_sql}) AS Total_PnL,
+                   AVG({pnl_sql}) AS Avg_PnL
+            FROM {self.table}
+            WHERE {is_timestamp}
+            GROUP BY hour
+            ORDER BY hour
+        """).set_index('hour').round(2)
         
         print(f"\n🕐 HOURLY PERFORMANCE:")
         print(hourly_pnl)
         
         return {
-            'daily_pnl': daily_pnl.to_dict(),
-            'hourly_analysis': hourly_pnl.to_dict()
+            'daily_pnl': daily_pnl,
+            'hourly_analysis': hourly_pnl
         }
     
     def identify_loss_patterns(self) -> Dict:
         """Identify patterns in losing trades"""
-        if self.trades_df is None or self.trades_df.empty:
+        if not self._has_trades():
             return {}
         
         print("\n🔍 LOSS PATTERN ANALYSIS")
         print("=" * 50)
         
-        df = self.trades_df.copy()
-        pnl_col = [col for col in df.columns if 'pnl' in col.lower()][0]
-        
-        # Convert PnL to numeric
-        df[pnl_col] = pd.to_numeric(df[pnl_col], errors='coerce')
-        
-        # Identify losing trades
-        losing_trades = df[df[pnl_col] < 0].copy()
+        if not self._pnl_col:
+            print("❌ No PnL column found")
+            return {}
         
-        if losing_trades.empty:
+        pnl_sql = _numeric(self._pnl_col)
+        # SQLite sorts text above every number, so a plain "< 0" on the raw column
+        # matches only numeric losses and can range-scan the pnl index
+        pnl_col = _quote(self._pnl_col)
+        
+        # Losing-trade stats and the loss-size histogram in one query
+        losses = self._agg(f"""
+            SELECT COUNT(*) AS losing_count,
+                   TOTAL({pnl_sql}) AS total_loss,
+                   AVG({pnl_sql}) AS avg_loss,
+                   MIN({pnl_sql}) AS max_loss,
+                   COUNT(CASE WHEN {pnl_sql} >= -100 THEN 1 END) AS small,
+                   COUNT(CASE WHEN {pnl_sql} < -100 AND {pnl_sql} >= -500 THEN 1 END) AS medium,
+                   COUNT(CASE WHEN {pnl_sql} < -500 AND {pnl_sql} >= -1000 THEN 1 END) AS large,
+                   COUNT(CASE WHEN {pnl_sql} < -1000 THEN 1 END) AS very_large
+            FROM {self.table}
+            WHERE {pnl_col} < 0
+        """).iloc[0]
+        
+        losing_count = int(losses['losing_count'])
+        if losing_count == 0:
             print("✅ No losing trades found!")
             return {}
         
-        print(f"📊 Total losing trades: {len(losing_trades)}")
-        print(f"💸 Total losses: ₹{abs(losing_trades[pnl_col].sum()):,.2f}")
-        print(f"📉 Average loss: ₹{abs(losing_trades[pnl_col].mean()):,.2f}")
-        print(f"📉 Median loss: ₹{abs(losing_trades[pnl_col].median()):,.2f}")
-        print(f"📉 Largest loss: ₹{abs(losing_trades[pnl_col].min()):,.2f}")
+        median_loss = self._median(pnl_col, f"{pnl_col} < 0")
+        
+        print(f"📊 Total losing trades: {losing_count}")
+        print(f"💸 Total losses: ₹{abs(losses['total_loss']):,.2f}")
+        print(f"📉 Average loss: ₹{abs(losses['avg_loss']):,.2f}")
+        print(f"📉 Median loss: ₹{abs(median_loss):,.2f}")
+        print(f"📉 Largest loss: ₹{abs(losses['max_loss']):,.2f}")
         
         # Analyze loss distribution
         loss_ranges = {
-            'Small (0-100)': len(losing_trades[losing_trades[pnl_col] >= -100]),
-            'Medium (100-500)': len(losing_trades[(losing_trades[pnl_col] < -100) & (losing_trades[pnl_col] >= -500)]),
-            'Large (500-1000)': len(losing_trades[(losing_trades[pnl_col] < -500) & (losing_trades[pnl_col] >= -1000)]),
-            'Very Large (>1000)': len(losing_trades[losing_trades[pnl_col] < -1000])
+            'Small (0-100)': int(losses['small']),
+            'Medium (100-500)': int(losses['medium']),
+            'Large (500-1000)': int(losses['large']),
+            'Very Large (>1000)': int(losses['very_large'])
         }
         
         print(f"\n📊 LOSS DISTRIBUTION:")
         for range_name, count in loss_ranges.items():
-            percentage = (count / len(losing_trades)) * 100
+            percentage = (count / losing_count) * 100
             print(f"   {range_name}: {count} trades ({percentage:.1f}%)")
         
         return {
-            'total_losing_trades': len(losing_trades),
-            'total_losses': abs(losing_trades[pnl_col].sum()),
-            'avg_loss': abs(losing_trades[pnl_col].mean()),
+            'total_losing_trades': losing_count,
+            'total_losses': abs(losses['total_loss']),
+            'avg_loss': abs(losses['avg_loss']),
             'loss_distribution': loss_ranges
         }
     
@@ -428,10 +601,10 @@ class TradeAnalyzer:
         print("📊 GENERATING COMPREHENSIVE TRADE ANALYSIS REPORT")
         print("=" * 60)
         
-        # Load data
+        # Locate the trade table
         self.load_trades_data()
         
-        if self.trades_df is None or self.trades_df.empty:
+        if not self._has_trades():
             print("❌ No trade data found. Analyzing database structure...")
             self.analyze_database_structure()
             return
@@ -462,13 +635,10 @@ class TradeAnalyzer:
             'recommendations': recommendations
         }
         
-        with open('trade_analysis_report.json', 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        with open('trade_analysis_report.json', 'w', encoding='utf-8') as f:
+            _write_json(f, report)
         
         print(f"\n💾 Detailed report saved to: trade_analysis_report.json")
-        
-        if self.conn:
-            self.conn.close()
 
 def main():
     """Main function"""
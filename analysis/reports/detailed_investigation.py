@@ -4,59 +4,97 @@ DETAILED TRADE INVESTIGATION
 Deep dive into all trades and open positions to understand the full picture
 """
 
-import sqlite3
+import os
+import sys
+from collections import Counter
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import json
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from db_connection import get_conn
+
+DB_PATH = 'trading_data.db'
+TRADE_COLUMNS = "timestamp, strategy_name, symbol, action, price, quantity"
+CHUNK_ROWS = 50_000
+
+def _ranked(totals: Counter) -> pd.Series:
+    """Counter as a value_counts-style Series: most frequent first, ties in first-seen order"""
+    counts = pd.Series(totals, dtype='int64')
+    return counts.iloc[np.argsort(-counts.to_numpy(), kind='stable')]
+
 def detailed_investigation():
     """Comprehensive investigation of all trading activity"""
-    conn = sqlite3.connect('trading_data.db')
+    conn = get_conn(DB_PATH)
     
     print("🕵️ DETAILED TRADE INVESTIGATION")
     print("=" * 60)
     
-    # Load all trades with detailed analysis
-    trades_df = pd.read_sql_query("""
-        SELECT * FROM trades 
+    # Stream the trade log and keep only running counts; insertion order of the
+    # counters is first appearance, which value_counts/unique() relied on
+    chunks = pd.read_sql_query(f"""
+        SELECT {TRADE_COLUMNS} FROM trades 
         ORDER BY timestamp, strategy_name, symbol
-    """, conn)
-    
-    print(f"📊 Total Trade Records: {len(trades_df)}")
+    """, conn, chunksize=CHUNK_ROWS)
+    
+    total_trades = 0
+    action_totals, strategy_totals, symbol_totals = Counter(), Counter(), Counter()
+    daily_totals, leg_totals = Counter(), Counter()
+    recent_trades = None
+    for chunk in chunks:
+        total_trades += len(chunk)
+        action_totals.update(chunk.groupby('action', sort=False).size().to_dict())
+        strategy_totals.update(chunk.groupby('strategy_name', sort=False).size().to_dict())
+        symbol_totals.update(chunk.groupby('symbol', sort=False).size().to_dict())
+        daily_totals.update(chunk['timestamp'].str[:10].value_counts(sort=False).to_dict())
+        leg_totals.update(chunk.groupby(['strategy_name', 'symbol', 'action'], sort=False).size().to_dict())
+        recent_trades = chunk.tail(10) if recent_trades is None else pd.concat([recent_trades, chunk]).tail(10)
+    
+    print(f"📊 Total Trade Records: {total_trades}")
     
     # Analyze trade distribution
     print(f"\n📈 TRADE DISTRIBUTION:")
-    action_counts = trades_df['action'].value_counts()
+    action_counts = _ranked(action_totals)
     for action, count in action_counts.items():
         print(f"   {action}: {count} trades")
     
-    strategy_counts = trades_df['strategy_name'].value_counts()
+    strategy_counts = _ranked(strategy_totals)
     print(f"\n🎯 TRADES BY STRATEGY:")
     for strategy, count in strategy_counts.items():
         print(f"   {strategy}: {count} trades")
     
-    symbol_counts = trades_df['symbol'].value_counts()
+    symbol_counts = _ranked(symbol_totals)
     print(f"\n📊 TOP TRADED SYMBOLS:")
     for symbol, count in symbol_counts.head(10).items():
         print(f"   {symbol}: {count} trades")
     
     # Analyze time distribution
-    trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'])
-    trades_df['date'] = trades_df['timestamp'].dt.date
-    trades_df['hour'] = trades_df['timestamp'].dt.hour
-    
-    daily_trades = trades_df['date'].value_counts().sort_index()
     print(f"\n📅 DAILY TRADE ACTIVITY:")
-    for date, count in daily_trades.items():
+    for date, count in sorted(daily_totals.items()):
         print(f"   {date}: {count} trades")
     
+    # LONG/SHORT counts per (strategy, symbol), kept in the order pairs first
+    # appear within each strategy
+    if leg_totals:
+        pair_counts = pd.Series(leg_totals, dtype='int64').unstack(fill_value=0)
+    else:
+        # No trades: unstack needs a MultiIndex, so start from an empty two-level frame
+        pair_counts = pd.DataFrame(
+            columns=['LONG', 'SHORT'], dtype='int64',
+            index=pd.MultiIndex.from_tuples([], names=['strategy_name', 'symbol']),
+        )
+    pair_counts = pair_counts.reindex(columns=['LONG', 'SHORT'], fill_value=0)
+    pairs = pd.DataFrame(list(dict.fromkeys(key[:2] for key in leg_totals)), columns=['strategy_name', 'symbol'])
+    pairs = pairs.iloc[np.argsort(pd.factorize(pairs['strategy_name'])[0], kind='stable')]
+    pair_counts = pair_counts.reindex(pd.MultiIndex.from_frame(pairs), fill_value=0)
+    
     # Check for pattern in LONG vs SHORT
     print(f"\n🔍 DETAILED ACTION ANALYSIS:")
-    for strategy in trades_df['strategy_name'].unique():
-        strategy_trades = trades_df[trades_df['strategy_name'] == strategy]
-        long_trades = len(strategy_trades[strategy_trades['action'] == 'LONG'])
-        short_trades = len(strategy_trades[strategy_trades['action'] == 'SHORT'])
-        
+    strategy_legs = pair_counts.groupby(level=0, sort=False).sum()
+    for strategy, long_trades, short_trades in strategy_legs.itertuples():
         print(f"   {strategy}:")
         print(f"     LONG entries: {long_trades}")
         print(f"     SHORT exits: {short_trades}")
@@ -68,44 +106,37 @@ def detailed_investigation():
     print(positions_df[['strategy_name', 'symbol', 'position_details']])
     
     # Portfolio state analysis
-    portfolio_df = pd.read_sql_query("SELECT * FROM portfolio_state", conn)
+    portfolio_df = pd.read_sql_query("""
+        SELECT strategy_name, initial_capital, trading_capital, banked_profit, total_charges
+        FROM portfolio_state
+    """, conn)
+    portfolio_df['total_value'] = portfolio_df['trading_capital'] + portfolio_df['banked_profit']
+    portfolio_df['pnl'] = portfolio_df['total_value'] - portfolio_df['initial_capital']
     print(f"\n💼 PORTFOLIO STATE:")
-    for _, row in portfolio_df.iterrows():
-        print(f"   {row['strategy_name']}:")
-        print(f"     Initial Capital: ₹{row['initial_capital']:,.2f}")
-        print(f"     Trading Capital: ₹{row['trading_capital']:,.2f}")
-        print(f"     Banked Profit: ₹{row['banked_profit']:,.2f}")
-        print(f"     Total Charges: ₹{row['total_charges']:,.2f}")
-        
-        # Calculate total value
-        total_value = row['trading_capital'] + row['banked_profit']
-        pnl = total_value - row['initial_capital']
-        print(f"     Current Total Value: ₹{total_value:,.2f}")
-        print(f"     Overall PnL: ₹{pnl:,.2f}")
+    for row in portfolio_df.itertuples(index=False):
+        print(f"   {row.strategy_name}:")
+        print(f"     Initial Capital: ₹{row.initial_capital:,.2f}")
+        print(f"     Trading Capital: ₹{row.trading_capital:,.2f}")
+        print(f"     Banked Profit: ₹{row.banked_profit:,.2f}")
+        print(f"     Total Charges: ₹{row.total_charges:,.2f}")
+        print(f"     Current Total Value: ₹{row.total_value:,.2f}")
+        print(f"     Overall PnL: ₹{row.pnl:,.2f}")
     
     # Look for unmatched trades (positions still open)
     print(f"\n🔍 UNMATCHED TRADES ANALYSIS:")
     
-    # Group by strategy and symbol to find unmatched
-    unmatched_analysis = []
-    
-    for strategy in trades_df['strategy_name'].unique():
-        strategy_trades = trades_df[trades_df['strategy_name'] == strategy]
-        
-        for symbol in strategy_trades['symbol'].unique():
-            symbol_trades = strategy_trades[strategy_trades['symbol'] == symbol]
-            
-            long_count = len(symbol_trades[symbol_trades['action'] == 'LONG'])
-            short_count = len(symbol_trades[symbol_trades['action'] == 'SHORT'])
-            
-            if long_count != short_count:
-                unmatched_analysis.append({
-                    'strategy': strategy,
-                    'symbol': symbol,
-                    'long_trades': long_count,
-                    'short_trades': short_count,
-                    'net_position': long_count - short_count
-                })
+    # Pairs whose LONG and SHORT counts differ still hold a position
+    unmatched_analysis = [
+        {
+            'strategy': strategy,
+            'symbol': symbol,
+            'long_trades': long_count,
+            'short_trades': short_count,
+            'net_position': long_count - short_count
+        }
+        for (strategy, symbol), long_count, short_count
+        in pair_counts.query('LONG != SHORT').itertuples()
+    ]
     
     if unmatched_analysis:
         print("📊 SYMBOLS WITH OPEN POSITIONS:")
@@ -123,11 +154,14 @@ def detailed_investigation():
     
     # Recent trading activity
     print(f"\n⏰ RECENT TRADING ACTIVITY (Last 10 trades):")
-    recent_trades = trades_df.tail(10)[['timestamp', 'strategy_name', 'symbol', 'action', 'price', 'quantity']]
-    for _, trade in recent_trades.iterrows():
-        print(f"   {trade['timestamp'].strftime('%Y-%m-%d %H:%M')} | {trade['symbol']} | {trade['action']} | ₹{trade['price']} x {trade['quantity']}")
-    
-    conn.close()
+    if recent_trades is not None and not recent_trades.empty:
+        # Format all lines column-wise and write them in one print
+        lines = (
+            "   " + pd.to_datetime(recent_trades['timestamp'], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M')
+            + " | " + recent_trades['symbol'] + " | " + recent_trades['action']
+            + " | ₹" + recent_trades['price'].astype(str) + " x " + recent_trades['quantity'].astype(str)
+        )
+        print("\n".join(lines))
 
 if __name__ == "__main__":
     detailed_investigation()
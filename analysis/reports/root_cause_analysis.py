@@ -4,44 +4,99 @@ PROBLEM ROOT CAUSE ANALYSIS
 Deep analysis of what's causing losses and how to fix it
 """
 
-import sqlite3
+import os
+import sys
+from collections import Counter
+import numpy as np
 import pandas as pd
 import json
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from db_connection import get_conn
+
+DB_PATH = 'trading_data.db'
+CHUNK_ROWS = 50_000
+
+def _ranked(totals: Counter) -> pd.Series:
+    """Counter as a value_counts-style Series: most frequent first, ties in first-seen order"""
+    counts = pd.Series(totals, dtype='int64')
+    return counts.iloc[np.argsort(-counts.to_numpy(), kind='stable')]
+
+def _trades_matching(category_counts: np.ndarray, category_mask) -> int:
+    """Number of trades whose action category is selected by category_mask"""
+    return int(category_counts[np.asarray(category_mask, dtype=bool)].sum())
+
 def root_cause_analysis():
     """Identify root causes of trading losses"""
     
     print("🔍 ROOT CAUSE ANALYSIS - क्यों हो रहे हैं नुकसान?")
     print("=" * 60)
     
-    conn = sqlite3.connect('trading_data.db')
-    trades_df = pd.read_sql_query("SELECT * FROM trades ORDER BY timestamp", conn)
-    trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'])
+    conn = get_conn(DB_PATH)
+    # The ISO timestamps carry the local (IST) hour at a fixed offset, so SQLite
+    # slices it out and no timestamp string is parsed in pandas. The trade log is
+    # streamed and folded into running counts and sums; the Counters keep first
+    # appearance order, which value_counts used to break ties
+    chunks = pd.read_sql_query("""
+        SELECT symbol, action, price, quantity,
+               CAST(substr(timestamp, 12, 2) AS INTEGER) AS hour
+        FROM trades ORDER BY timestamp
+    """, conn, chunksize=CHUNK_ROWS)
+    
+    total_trades = 0
+    total_volume = 0.0
+    max_trade_value = np.nan
+    large_trade_count = 0
+    action_totals = Counter()
+    symbol_totals = Counter()
+    symbol_volume = Counter()
+    hour_totals = Counter()
+    for chunk in chunks:
+        # Notional value of every trade, reused by the volume and sizing checks
+        trade_value = chunk['price'].to_numpy() * chunk['quantity'].to_numpy()
+        chunk = chunk.assign(trade_value=trade_value)
+        total_trades += len(chunk)
+        total_volume += trade_value.sum()
+        if len(chunk):
+            max_trade_value = np.fmax(max_trade_value, np.nanmax(trade_value))
+        large_trade_count += int((trade_value > 5000).sum())
+        action_totals.update(chunk['action'].value_counts(sort=False).to_dict())
+        symbol_totals.update(chunk['symbol'].value_counts(sort=False).to_dict())
+        symbol_volume.update(chunk.groupby('symbol', sort=False)['trade_value'].sum().to_dict())
+        hour_totals.update(chunk['hour'].value_counts(sort=False).to_dict())
+    
+    # Actions are a handful of distinct strings: the per-action totals are
+    # aligned with the sorted action names, and every classification below is
+    # evaluated on those names alone (missing actions are not counted)
+    categories = pd.Series(sorted(action_totals), dtype=object)
+    category_counts = np.array([action_totals[action] for action in categories], dtype=np.int64)
+    avg_trade_size = total_volume / total_trades if total_trades else np.nan
     
     # Problem 1: Overtrading Analysis
     print("🚨 PROBLEM 1: OVERTRADING")
     print("-" * 30)
     
-    total_volume = (trades_df['price'] * trades_df['quantity']).sum()
-    avg_trade_size = (trades_df['price'] * trades_df['quantity']).mean()
-    
     print(f"   Total Trade Volume: ₹{total_volume:,.0f}")
     print(f"   Average Trade Size: ₹{avg_trade_size:,.0f}")
-    print(f"   Trades in 2 days: {len(trades_df)}")
-    print(f"   Trades per day: {len(trades_df)/2:.0f}")
-    print(f"   ⚠️ TOO MUCH TRADING: {len(trades_df)} trades in just 2 days!")
+    print(f"   Trades in 2 days: {total_trades}")
+    print(f"   Trades per day: {total_trades/2:.0f}")
+    print(f"   ⚠️ TOO MUCH TRADING: {total_trades} trades in just 2 days!")
     
     # Problem 2: Stop Loss Analysis
     print(f"\n🛑 PROBLEM 2: POOR STOP LOSS MANAGEMENT")
     print("-" * 40)
     
-    stop_loss_trades = trades_df[trades_df['action'].str.contains('FINAL_EXIT_LOSS')]
-    normal_exits = trades_df[trades_df['action'].str.contains('EXIT') & ~trades_df['action'].str.contains('FINAL_EXIT_LOSS')]
+    is_stop_loss = categories.str.contains('FINAL_EXIT_LOSS').to_numpy(dtype=bool)
+    is_exit = categories.str.contains('EXIT').to_numpy(dtype=bool)
+    stop_loss_trades = _trades_matching(category_counts, is_stop_loss)
+    normal_exits = _trades_matching(category_counts, is_exit & ~is_stop_loss)
     
-    stop_loss_rate = len(stop_loss_trades) / (len(stop_loss_trades) + len(normal_exits)) * 100
+    stop_loss_rate = stop_loss_trades / (stop_loss_trades + normal_exits) * 100
     
-    print(f"   Stop Loss Exits: {len(stop_loss_trades)}")
-    print(f"   Normal Exits: {len(normal_exits)}")
+    print(f"   Stop Loss Exits: {stop_loss_trades}")
+    print(f"   Normal Exits: {normal_exits}")
     print(f"   Stop Loss Rate: {stop_loss_rate:.1f}%")
     
     if stop_loss_rate > 10:
@@ -51,21 +106,19 @@ def root_cause_analysis():
     print(f"\n🔄 PROBLEM 3: SYMBOL CONCENTRATION")
     print("-" * 35)
     
-    symbol_trades = trades_df['symbol'].value_counts()
+    symbol_trades = _ranked(symbol_totals)
     heavy_symbols = symbol_trades[symbol_trades >= 4]
     
     print(f"   Heavily traded symbols ({len(heavy_symbols)}):")
     for symbol, count in heavy_symbols.items():
-        symbol_data = trades_df[trades_df['symbol'] == symbol]
-        volume = (symbol_data['price'] * symbol_data['quantity']).sum()
+        volume = symbol_volume[symbol]
         print(f"     {symbol}: {count} trades, ₹{volume:,.0f} volume")
     
     # Problem 4: Timing Analysis
     print(f"\n⏰ PROBLEM 4: TRADING TIMING")
     print("-" * 30)
     
-    trades_df['hour'] = trades_df['timestamp'].dt.hour
-    hourly_trades = trades_df['hour'].value_counts().sort_index()
+    hourly_trades = pd.Series(hour_totals, dtype='int64').sort_index()
     
     print(f"   Trading hours distribution:")
     for hour, count in hourly_trades.items():
@@ -76,14 +129,11 @@ def root_cause_analysis():
     print(f"\n💰 PROBLEM 5: POSITION SIZING")
     print("-" * 30)
     
-    trade_values = trades_df['price'] * trades_df['quantity']
-    large_trades = trade_values[trade_values > 5000]
-    
-    print(f"   Large trades (>₹5000): {len(large_trades)}")
-    print(f"   Largest trade: ₹{trade_values.max():,.0f}")
-    print(f"   Average trade size: ₹{trade_values.mean():,.0f}")
+    print(f"   Large trades (>₹5000): {large_trade_count}")
+    print(f"   Largest trade: ₹{max_trade_value:,.0f}")
+    print(f"   Average trade size: ₹{avg_trade_size:,.0f}")
     
-    if trade_values.max() > 10000:
+    if max_trade_value > 10000:
         print(f"   ⚠️ POSITION SIZES TOO LARGE for paper trading!")
     
     # Problem 6: Strategy Efficiency
@@ -94,8 +144,8 @@ def root_cause_analysis():
     profitable_actions = ['EXIT_SHORT', 'EXIT_LONG']  # Assuming these are profitable exits
     stop_loss_actions = ['FINAL_EXIT_LOSS_SHORT', 'FINAL_EXIT_LOSS_LONG']
     
-    profitable_exits = len(trades_df[trades_df['action'].isin(profitable_actions)])
-    loss_exits = len(trades_df[trades_df['action'].isin(stop_loss_actions)])
+    profitable_exits = _trades_matching(category_counts, categories.isin(profitable_actions))
+    loss_exits = _trades_matching(category_counts, categories.isin(stop_loss_actions))
     
     if profitable_exits + loss_exits > 0:
         strategy_win_rate = profitable_exits / (profitable_exits + loss_exits) * 100
@@ -112,13 +162,13 @@ def root_cause_analysis():
     
     recommendations = []
     
-    if len(trades_df) > 50:
+    if total_trades > 50:
         recommendations.append("1. 🛑 REDUCE TRADING FREQUENCY: 54 trades/day is excessive")
     
     if stop_loss_rate > 10:
         recommendations.append("2. 📊 IMPROVE ENTRY TIMING: High stop-loss rate indicates poor entries")
     
-    if trade_values.max() > 8000:
+    if max_trade_value > 8000:
         recommendations.append("3. 💰 REDUCE POSITION SIZES: Large positions increase risk")
     
     if len(heavy_symbols) > 2:
@@ -133,17 +183,15 @@ def root_cause_analysis():
     # Specific numbers for fixes
     print(f"\n📊 SUGGESTED IMPROVEMENTS:")
     print("-" * 30)
-    print(f"   • Max trades per day: 10-15 (currently {len(trades_df)/2:.0f})")
-    print(f"   • Max position size: ₹3000 (currently ₹{trade_values.max():,.0f})")
+    print(f"   • Max trades per day: 10-15 (currently {total_trades/2:.0f})")
+    print(f"   • Max position size: ₹3000 (currently ₹{max_trade_value:,.0f})")
     print(f"   • Target win rate: 70%+ (currently {strategy_win_rate:.1f}%)")
     print(f"   • Max stop loss rate: 20% (currently {stop_loss_rate:.1f}%)")
     
-    conn.close()
-    
     return {
-        'overtrading': len(trades_df) > 50,
+        'overtrading': total_trades > 50,
         'high_stop_loss_rate': stop_loss_rate > 15,
-        'large_positions': trade_values.max() > 8000,
+        'large_positions': max_trade_value > 8000,
         'low_win_rate': strategy_win_rate < 70,
         'recommendations': recommendations
     }
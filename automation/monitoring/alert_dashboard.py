@@ -8,11 +8,30 @@ Background में चलने वाला monitoring dashboard
 import json
 import time
 import os
+import sys
 from datetime import datetime, timedelta
 import subprocess
 import threading
 from collections import deque
 
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # inotify_simple is optional (Linux only); the monitor falls back to polling
+    INotify = None
+
+# On first open only the tail of alerts.log is read to recover the latest alerts
+ALERT_BACKSCAN_BYTES = 8192
+# Longest the alert monitor sleeps between checks (also the polling interval)
+ALERT_CHECK_SECONDS = 10
+
+def _clear_screen():
+    """Clear the terminal with an ANSI escape instead of forking `clear`"""
+    if os.name == 'nt':  # legacy Windows consoles may not honour ANSI escapes
+        os.system('cls')
+        return
+    sys.stdout.write("\x1b[2J\x1b[H")
+    sys.stdout.flush()
+
 class AlertDashboard:
     def __init__(self):
         self.script_dir = "/home/ubuntu/PaperTradingV1.3"
@@ -20,27 +39,70 @@ class AlertDashboard:
         self.alert_log = f"{self.script_dir}/logs/alerts.log"
         self.running = True
         self.recent_alerts = deque(maxlen=50)
+        # alerts.log is kept open and only newly appended bytes are read;
+        # alerts_seen counts every alert line read so far (never decreases)
+        self.alerts_seen = 0
+        self._alert_lock = threading.Lock()
+        self._log_file = None
+        self._log_inode = None
+        self._log_partial = b""
+        # Parsed system_status.json, reused while its (mtime, size) is unchanged
+        self._status_cache = {}
+        self._status_key = None
         
     def load_system_status(self):
         """Load current system status"""
         try:
-            if os.path.exists(self.status_file):
+            st = os.stat(self.status_file)
+            key = (st.st_mtime_ns, st.st_size)
+            if key != self._status_key:
                 with open(self.status_file, 'r') as f:
-                    return json.load(f)
+                    self._status_cache = json.load(f)
+                self._status_key = key
+            return self._status_cache
         except:
             pass
         return {}
     
+    def _read_new_alerts(self):
+        """Append alert lines written since the last call to recent_alerts"""
+        try:
+            st = os.stat(self.alert_log)
+        except OSError:
+            return
+        
+        if self._log_file is not None and (st.st_ino != self._log_inode or st.st_size < self._log_file.tell()):
+            # Rotated or truncated: the new file is read from its start
+            self._log_file.close()
+            self._log_file = open(self.alert_log, 'rb')
+            self._log_inode = st.st_ino
+            self._log_partial = b""
+        elif self._log_file is None:
+            self._log_file = open(self.alert_log, 'rb')
+            self._log_inode = st.st_ino
+            start = max(0, st.st_size - ALERT_BACKSCAN_BYTES)
+            self._log_file.seek(start)
+            if start:
+                self._log_file.readline()  # drop the partial first line
+        
+        data = self._log_partial + self._log_file.read()
+        *lines, self._log_partial = data.split(b"\n")
+        for line in lines:
+            self.recent_alerts.append(line.decode('utf-8', errors='replace'))
+        self.alerts_seen += len(lines)
+    
+    def _refresh_alerts(self):
+        """Read any new alerts; returns (alerts_seen, recent alerts) as one snapshot"""
+        with self._alert_lock:
+            try:
+                self._read_new_alerts()
+            except OSError:
+                pass
+            return self.alerts_seen, list(self.recent_alerts)
+    
     def get_recent_alerts(self):
         """Get recent alerts from log file"""
-        try:
-            if os.path.exists(self.alert_log):
-                with open(self.alert_log, 'r') as f:
-                    lines = f.readlines()
-                    return lines[-10:]  # Last 10 alerts
-        except:
-            pass
-        return []
+        return self._refresh_alerts()[1][-10:]  # Last 10 alerts
     
     def send_webhook_alert(self, severity, message):
         """Send alert to webhook (you can configure this)"""
@@ -57,7 +119,7 @@ class AlertDashboard:
     
     def display_status(self):
         """Display current system status"""
-        os.system('clear')
+        _clear_screen()
         print("🔍 Paper Trading Bot - Live Alert Dashboard")
         print("=" * 60)
         print(f"🕒 Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -93,18 +155,53 @@ class AlertDashboard:
         print("   Check logs: tail -f logs/alerts.log")
         print("   System status: ./check_system_status.sh")
         
+    def _watch_alert_log(self):
+        """
+        inotify watch on the log directory, or None to poll.
+        
+        Watching the directory rather than the file also catches alerts.log being
+        rotated (CREATE/MOVED_TO) without re-adding the watch.
+        """
+        if INotify is None:
+            return None
+        try:
+            watcher = INotify()
+            watcher.add_watch(os.path.dirname(self.alert_log), flags.MODIFY | flags.CREATE | flags.MOVED_TO)
+            return watcher
+        except OSError:
+            return None
+    
+    def _wait_for_alerts(self, watcher):
+        """Block until alerts.log changes, or at most ALERT_CHECK_SECONDS"""
+        if watcher is None:
+            time.sleep(ALERT_CHECK_SECONDS)
+            return
+        log_name = os.path.basename(self.alert_log)
+        deadline = time.monotonic() + ALERT_CHECK_SECONDS
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if any(event.name == log_name for event in watcher.read(timeout=int(remaining * 1000))):
+                return
+    
     def monitor_alerts(self):
         """Monitor for new alerts"""
-        last_alert_count = 0
+        last_alert_count = None
+        watcher = self._watch_alert_log()
         
         while self.running:
             try:
-                alerts = self.get_recent_alerts()
-                current_count = len(alerts)
+                current_count, alerts = self._refresh_alerts()
+                if last_alert_count is None:
+                    # Startup: the latest alerts count as new, as before
+                    new_alerts = alerts[-10:]
+                else:
+                    new_count = min(current_count - last_alert_count, len(alerts))
+                    new_alerts = alerts[len(alerts) - new_count:]
                 
-                if current_count > last_alert_count:
+                if new_alerts:
                     # New alert detected
-                    new_alerts = alerts[last_alert_count:]
                     for alert in new_alerts:
                         if "[HIGH]" in alert or "[CRITICAL]" in alert:
                             # Send immediate notification for high/critical alerts
@@ -112,7 +209,7 @@ class AlertDashboard:
                             self.send_webhook_alert("HIGH", alert.strip())
                 
                 last_alert_count = current_count
-                time.sleep(10)  # Check every 10 seconds
+                self._wait_for_alerts(watcher)  # Wake on new alerts, or every 10 seconds
                 
             except Exception as e:
                 print(f"Error monitoring alerts: {e}")
@@ -8,7 +8,11 @@ import os
 import sys
 import subprocess
 import logging
+import logging.handlers
+import queue
+import atexit
 import time
+import threading
 from datetime import datetime
 import signal
 
@@ -17,20 +21,38 @@ log_dir = "/home/ubuntu/PaperTradingV1.3/logs"
 os.makedirs(log_dir, exist_ok=True)
 log_file = os.path.join(log_dir, f"automation_{datetime.now().strftime('%Y-%m-%d')}.log")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Callers only enqueue records; a background listener thread does the file/console I/O
+log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+log_handlers = [logging.FileHandler(log_file), logging.StreamHandler(sys.stdout)]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+
+log_queue = queue.Queue(-1)
+root_logger = logging.getLogger()
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+root_logger.setLevel(logging.INFO)
+log_listener = logging.handlers.QueueListener(log_queue, *log_handlers)
+log_listener.start()
+_log_listener_running = True
+
+def stop_logging():
+    """Flush queued log records and stop the listener thread (safe to call twice)"""
+    global _log_listener_running
+    if _log_listener_running:
+        _log_listener_running = False
+        log_listener.stop()
+
+atexit.register(stop_logging)
 
 logger = logging.getLogger(__name__)
 
 # Global variable to track running processes
 running_processes = []
 
+# Warn if the paper trader's log has not been touched for this long
+CHILD_SILENCE_SECONDS = 15 * 60
+PAPER_TRADER_LOG = os.path.join("logs", "papertrading.log")
+
 def signal_handler(signum, frame):
     """Handle termination signals gracefully"""
     logger.info("Received termination signal. Cleaning up...")
@@ -43,6 +65,7 @@ def signal_handler(signum, frame):
             except subprocess.TimeoutExpired:
                 logger.warning(f"Force killing process {process.pid}")
                 process.kill()
+    stop_logging()
     sys.exit(0)
 
 # Register signal handlers
@@ -78,6 +101,24 @@ def run_retrain_optimizer():
         logger.error(f"❌ Error running retrain optimizer: {str(e)}")
         return False
 
+def watch_child_activity(process, path=PAPER_TRADER_LOG):
+    """Arm a background check that warns only if a running child has gone quiet"""
+    timer = threading.Timer(CHILD_SILENCE_SECONDS, check_child_activity, args=(process, path))
+    timer.daemon = True
+    timer.start()
+
+def check_child_activity(process, path):
+    """Log a warning if the child's log has not changed recently, then re-arm"""
+    if process.poll() is not None:
+        return
+    try:
+        silent_for = time.time() - os.stat(path).st_mtime
+    except OSError:
+        silent_for = None
+    if silent_for is not None and silent_for > CHILD_SILENCE_SECONDS:
+        logger.warning(f"⚠️ Paper trading system (PID {process.pid}) silent for {silent_for / 60:.0f} minutes")
+    watch_child_activity(process, path)
+
 def run_paper_trading():
     """Run the paper trading system"""
     logger.info("📈 Starting Paper Trading System...")
@@ -86,29 +127,29 @@ def run_paper_trading():
         # Change to the correct directory
         os.chdir("/home/ubuntu/PaperTradingV1.3")
         
-        # Start paper trading as a background process
-        process = subprocess.Popen([
-            sys.executable, "main_papertrader.py"
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        # Start paper trading as a background process. Its output goes straight to a
+        # file so the child can never block on a full pipe. It runs in its own session
+        # so terminal signals reach it only via signal_handler.
+        output_file = os.path.join(log_dir, f"papertrader_{datetime.now().strftime('%Y-%m-%d')}.out")
+        with open(output_file, "ab", buffering=0) as output:
+            process = subprocess.Popen([
+                sys.executable, "main_papertrader.py"
+            ], stdout=output, stderr=subprocess.STDOUT, start_new_session=True)
         
         running_processes.append(process)
         
         logger.info(f"✅ Paper Trading System started with PID: {process.pid}")
+        logger.info(f"📝 Paper trading output: {output_file}")
         logger.info("📊 Paper trading will run until market close or manual termination")
         
-        # Monitor the process
-        while process.poll() is None:
-            time.sleep(60)  # Check every minute
-            logger.info("📈 Paper trading system is running...")
-        
-        # Process has ended
-        stdout, stderr = process.communicate()
+        # Only speak up if the child goes quiet; otherwise block until it exits
+        watch_child_activity(process)
+        process.wait()
         if process.returncode == 0:
             logger.info("✅ Paper Trading System completed successfully")
         else:
             logger.error(f"❌ Paper Trading System ended with return code {process.returncode}")
-            if stderr:
-                logger.error(f"Error: {stderr}")
+            logger.error(f"Error: see {output_file}")
         
         return process.returncode == 0
         
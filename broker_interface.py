@@ -3,20 +3,137 @@
 # v3.0 – library + runnable CLI (runtime broker selection + connect validation)
 
 import os
+import re
+import stat
 import sys
+import tempfile
+import json
 import logging
 import requests  # Add this for Scrip Master download
 import io        # Add this for CSV processing
 import time
-from datetime import datetime
-from typing import Optional, Dict, Any, cast
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Callable, Tuple, cast
 
 import pandas as pd
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# Parquet copy of the instruments dump (typed columns, no CSV tokenizing); optional
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+except Exception:
+    pyarrow = None
+
+# Faster parser for the Scrip Master JSON; optional
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None
+
+
+def _json_loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+# Parsed instruments dumps shared across AngelOneInterface instances, keyed by
+# (abspath, st_mtime_ns, st_size) of the file read: a changed file is a new key.
+INSTRUMENTS_CACHE_SIZE = 2
+_INSTRUMENTS_CACHE: "OrderedDict[tuple, Tuple[pd.DataFrame, Dict[str, Dict[str, str]]]]" = OrderedDict()
+
+
+def _file_key(path: str) -> tuple:
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+# =========================
+# Historical candle memo
+# =========================
+HIST_CACHE_SIZE = 256
+# Concurrent historical requests in get_historical_data_many (Kite allows ~3 req/s)
+HIST_FETCH_CONCURRENCY = 3
+
+
+class _HistoryCache:
+    """
+    LRU of candle frames keyed by request arguments. Only windows that ended
+    before today are stored: their candles can no longer change, while a window
+    reaching into the live session must always be re-fetched.
+    """
+    def __init__(self, maxsize: int = HIST_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._frames: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()  # get_historical_data_many fetches from worker threads
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._frames.get(key)
+            if df is None:
+                return None
+            self._frames.move_to_end(key)
+        return df.copy()
+
+    def put(self, key: tuple, to_dt: datetime, df: pd.DataFrame):
+        if to_dt.date() >= datetime.now(to_dt.tzinfo).date():
+            return
+        with self._lock:
+            self._frames[key] = df.copy()
+            if len(self._frames) > self.maxsize:
+                self._frames.popitem(last=False)
+
+
+def _parse_candle_times(col: pd.Series) -> pd.Series:
+    """
+    Parse ISO-8601 candle stamps such as '2024-01-01T09:15:00+05:30'. When every
+    row carries the same offset, the naive part goes through the fixed-format
+    C parser and the offset is attached once; parsing the offset per row is
+    an order of magnitude slower. Anything else takes the general ISO path.
+    """
+    text = col.astype(str)
+    offsets = text.str.slice(19).unique()
+    if len(offsets) == 1 and re.fullmatch(r"[+-]\d{2}:\d{2}", offsets[0]):
+        return pd.to_datetime(text.str.slice(0, 19), format="%Y-%m-%dT%H:%M:%S").dt.tz_localize(offsets[0])
+    return pd.to_datetime(col, format="ISO8601")
+
+
+def _split_windows(from_dt: datetime, to_dt: datetime, max_days: Optional[int],
+                   step: timedelta = timedelta(seconds=1)) -> List[Tuple[datetime, datetime]]:
+    """
+    Split [from_dt, to_dt] into consecutive windows of at most max_days each, the
+    next starting one `step` (the API's time resolution) after the previous ends.
+    """
+    if max_days is None:
+        return [(from_dt, to_dt)]
+    span = timedelta(days=max_days) - step
+    windows = []
+    start = from_dt
+    while start <= to_dt:
+        end = min(start + span, to_dt)
+        windows.append((start, end))
+        start = end + step
+    return windows or [(from_dt, to_dt)]
+
+
+async def _fetch_many(fetch: Callable[..., pd.DataFrame], symbols: List[str], *args, **kwargs) -> List[pd.DataFrame]:
+    """
+    Run a blocking per-symbol fetch for every symbol on worker threads so the
+    network round-trips overlap. Results come back in the order of `symbols`.
+    """
+    gate = asyncio.Semaphore(HIST_FETCH_CONCURRENCY)
+
+    async def one(symbol: str) -> pd.DataFrame:
+        async with gate:
+            return await asyncio.to_thread(fetch, symbol, *args, **kwargs)
+
+    return await asyncio.gather(*(one(s) for s in symbols))
+
 # =========================
 # Zerodha (KiteConnect)
 # =========================
@@ -25,6 +142,26 @@ try:
 except Exception:
     KiteConnect = None
 
+# HTTPAdapter settings for the Kite client's requests session: keep-alive
+# connections are reused across calls, transient connect/read errors retried.
+KITE_HTTP_POOL = {
+    "pool_connections": 4,
+    "pool_maxsize": 16,
+    "max_retries": Retry(total=3, backoff_factor=0.3),
+}
+
+# Longest span (days) Kite serves in one historical_data call, per interval
+KITE_MAX_DAYS = {
+    "minute": 60,
+    "3minute": 100,
+    "5minute": 100,
+    "10minute": 100,
+    "15minute": 200,
+    "30minute": 200,
+    "60minute": 400,
+    "day": 2000,
+}
+
 
 class ZerodhaInterface:
     """
@@ -42,7 +179,12 @@ class ZerodhaInterface:
             raise ImportError("kiteconnect not installed. pip install kiteconnect")
         self.api_key = api_key
         self.api_secret = api_secret
-        self.kite = KiteConnect(api_key=self.api_key)
+        self.kite = KiteConnect(api_key=self.api_key, pool=KITE_HTTP_POOL)
+        # exchange -> {tradingsymbol: instrument_token}, built once per process
+        self._instrument_maps: Dict[str, Dict[str, int]] = {}
+        self._hist_cache = _HistoryCache()
+        # Bounds in-flight historical_data calls across window and symbol fan-out
+        self._hist_gate = threading.BoundedSemaphore(HIST_FETCH_CONCURRENCY)
         if access_token:
             self.set_access_token(access_token)
 
@@ -68,29 +210,64 @@ class ZerodhaInterface:
         instruments = self.kite.instruments(exchange)
         return pd.DataFrame(instruments)
 
-    def _resolve_token(self, instruments: pd.DataFrame, symbol: str) -> Optional[int]:
-        row = instruments.loc[instruments['tradingsymbol'] == symbol]
-        if not row.empty:
-            return int(row.iloc[0]['instrument_token'])
-        return None
+    def _instrument_map(self, exchange: str = "NSE") -> Dict[str, int]:
+        """
+        tradingsymbol -> instrument_token for one exchange. The instruments dump is
+        fetched once and only its two needed fields are read from the raw records,
+        without building a full DataFrame (reversed, so the first listing of a
+        symbol wins as with a row lookup).
+        """
+        if exchange not in self._instrument_maps:
+            instruments = self.kite.instruments(exchange)
+            self._instrument_maps[exchange] = {
+                row["tradingsymbol"]: row["instrument_token"] for row in reversed(instruments)
+            }
+        return self._instrument_maps[exchange]
+
+    def _resolve_token(self, symbol: str, exchange: str = "NSE") -> Optional[int]:
+        # Exact key first (callers pass NSE symbols upper-case); upper() only on a miss
+        instrument_map = self._instrument_map(exchange)
+        token = instrument_map.get(symbol)
+        if token is None:
+            token = instrument_map.get(symbol.upper())
+        return int(token) if token is not None else None
 
     def get_historical_candles(self, symbol: str, interval: str, from_dt: datetime, to_dt: datetime) -> pd.DataFrame:
         """
         Kite intervals: 'minute','3minute','5minute','10minute','15minute','30minute','60minute','day'
         """
-        instruments = self.get_instruments("NSE")
-        token = self._resolve_token(instruments, symbol)
+        cache_key = (symbol, interval, from_dt, to_dt)
+        cached = self._hist_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        token = self._resolve_token(symbol, "NSE")
         if token is None:
             raise ValueError(f"Zerodha: instrument token not found for {symbol}")
 
-        data = self.kite.historical_data(token, from_dt, to_dt, interval)
-        df = pd.DataFrame(data)
+        # Ranges longer than Kite's per-call limit are fetched window by window, concurrently
+        # Windows yield raw candle records; one DataFrame is built from all of them
+        windows = _split_windows(from_dt, to_dt, KITE_MAX_DAYS.get(interval))
+        if len(windows) == 1:
+            records = self._fetch_window(token, interval, *windows[0])
+        else:
+            records = []
+            with ThreadPoolExecutor(max_workers=HIST_FETCH_CONCURRENCY) as pool:
+                for part in pool.map(lambda w: self._fetch_window(token, interval, *w), windows):
+                    records.extend(part)
+        df = pd.DataFrame(records)
         if not df.empty:
-            df.rename(columns={"date": "datetime"}, inplace=True)
+            # Relabel in place: rename() would rebuild the frame just to change a label
+            df.columns = ["datetime" if col == "date" else col for col in df.columns]
             df["datetime"] = pd.to_datetime(df["datetime"])
             df["symbol"] = symbol
+        self._hist_cache.put(cache_key, to_dt, df)
         return df
 
+    def _fetch_window(self, token: int, interval: str, from_dt: datetime, to_dt: datetime) -> List[Dict[str, Any]]:
+        with self._hist_gate:
+            return self.kite.historical_data(token, from_dt, to_dt, interval)
+
     # --- compat shim: simple strings like 'minute' / '15minute'
     def get_historical_data(self, symbol: str, interval: str, from_date: datetime, to_date: datetime, **kwargs) -> pd.DataFrame:
         norm = (interval or "").lower()
@@ -104,6 +281,10 @@ class ZerodhaInterface:
             kite_interval = "minute"
         return self.get_historical_candles(symbol, kite_interval, from_date, to_date)
 
+    async def get_historical_data_many(self, symbols: List[str], interval: str, from_date: datetime, to_date: datetime, **kwargs) -> List[pd.DataFrame]:
+        """get_historical_data for several symbols concurrently; frames in the order of `symbols`."""
+        return await _fetch_many(self.get_historical_data, symbols, interval, from_date, to_date, **kwargs)
+
     # --- compat shim for older call sites
     def get_historical_data_by_interval(self, symbol: str, interval: str, from_date: datetime, to_date: datetime, **kwargs) -> pd.DataFrame:
         return self.get_historical_candles(symbol, interval, from_date, to_date)
@@ -143,6 +324,17 @@ class AngelOneInterface:
         60: "ONE_HOUR",
         1440: "ONE_DAY",
     }
+    # Longest span (days) getCandleData serves in one call, per interval
+    MAX_DAYS = {
+        "ONE_MINUTE": 30,
+        "THREE_MINUTE": 60,
+        "FIVE_MINUTE": 100,
+        "TEN_MINUTE": 100,
+        "FIFTEEN_MINUTE": 200,
+        "THIRTY_MINUTE": 200,
+        "ONE_HOUR": 400,
+        "ONE_DAY": 2000,
+    }
 
     def __init__(
         self,
@@ -167,11 +359,17 @@ class AngelOneInterface:
 
         self.smart: Optional[Any] = None
         self.instruments_df: Optional[pd.DataFrame] = None
+        # exchange -> {symbol: token}, built once from instruments_df
+        self._token_maps: Dict[str, Dict[str, str]] = {}
+        # exchange -> instruments_df rows for that exchange, filtered once
+        self._exchange_views: Dict[str, pd.DataFrame] = {}
+        self._hist_cache = _HistoryCache()
 
         # Create session on init
         self.authenticate()
 
         self._last_hist_call = 0.0
+        self._hist_lock = threading.Lock()  # keeps _throttle_hist spacing across worker threads
         self._min_hist_gap = float(os.getenv("ANGELONE_RATE_SEC", "0.6"))  # seconds between calls
 
     def authenticate(self):
@@ -228,36 +426,41 @@ class AngelOneInterface:
     def _save_env_value(self, key: str, value: str, env_path: str = ".env"):
         if not value:
             return
-        lines = []
+        content = ""
         if os.path.exists(env_path):
             with open(env_path, "r", encoding="utf-8") as f:
-                lines = f.read().splitlines()
-        found = False
-        with open(env_path, "w", encoding="utf-8") as f:
-            for line in lines:
-                if line.startswith(f"{key}="):
-                    f.write(f"{key}={value}\n")
-                    found = True
-                else:
-                    f.write(line + "\n")
-            if not found:
-                f.write(f"{key}={value}\n")
+                content = f.read()
+        # Token refreshes often hand back the value already on disk: nothing to write
+        if dotenv_values(stream=io.StringIO(content)).get(key) == value:
+            return
+        line = f"{key}={value}"
+        content, n = re.subn(rf"^{re.escape(key)}=.*$", lambda _: line, content, flags=re.M)
+        if n == 0:
+            content = (content.rstrip("\n") + "\n" if content.strip() else "") + line + "\n"
+        # Write a private temp file beside the target and rename it over .env, so the
+        # file is never half-written; it keeps .env's permissions (it holds secrets)
+        mode = stat.S_IMODE(os.stat(env_path).st_mode) if os.path.exists(env_path) else 0o600
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(env_path)), prefix=".env.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, env_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
 
     def get_instruments(self, exchange: str = "NSE") -> pd.DataFrame:
         if self.instruments_df is not None:
             # in-memory cache
-            df = self.instruments_df
-            if "exch_seg" in df.columns:
-                return df[df["exch_seg"].str.contains(exchange, case=False, na=False)].copy()
-            return df
+            return self._exchange_view(exchange).copy()
 
         # disk cache?
-        if os.path.exists(self.instruments_csv):
-            df = pd.read_csv(self.instruments_csv, low_memory=False)  # <-- Added low_memory=False here
+        df = self._read_instruments_cache()
+        if df is not None:
             self.instruments_df = df
-            if "exch_seg" in df.columns:
-                return df[df["exch_seg"].str.contains(exchange, case=False, na=False)].copy()
-            return df
+            return self._exchange_view(exchange).copy()
 
         # Try client method if present (some builds expose it), else fallback to public Scrip Master
         df = None
@@ -273,45 +476,143 @@ class AngelOneInterface:
             json_url = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
             csv_url  = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.csv"
             try:
+                # Parse the raw bytes: skips requests' text decoding of the ~15MB body
                 r = requests.get(json_url, timeout=20)
                 r.raise_for_status()
-                df = pd.DataFrame(r.json())
+                df = pd.DataFrame(_json_loads(r.content))
             except Exception:
                 r = requests.get(csv_url, timeout=20)
                 r.raise_for_status()
-                df = pd.read_csv(io.StringIO(r.text))
+                df = pd.read_csv(io.BytesIO(r.content), engine="pyarrow" if pyarrow is not None else "c", dtype={"token": str})
 
         if df is None or df.empty:
             raise ValueError("AngelOne instruments empty (Scrip Master load failed).")
 
-        # Persist & cache
-        try:
-            df.to_csv(self.instruments_csv, index=False)
-            logger.info(f"💾 Cached AngelOne instruments to {self.instruments_csv}")
-        except Exception:
-            pass
+        # Persist & cache: Parquet when available, CSV only as the fallback format
+        if self._write_instruments_parquet(df):
+            logger.info(f"💾 Cached AngelOne instruments to {self._instruments_parquet()}")
+        else:
+            try:
+                df.to_csv(self.instruments_csv, index=False)
+                logger.info(f"💾 Cached AngelOne instruments to {self.instruments_csv}")
+            except Exception:
+                pass
 
         self.instruments_df = df
-        if "exch_seg" in df.columns:
-            return df[df["exch_seg"].str.contains(exchange, case=False, na=False)].copy()
+        return self._exchange_view(exchange).copy()
+
+    def _exchange_view(self, exchange: str) -> pd.DataFrame:
+        """instruments_df rows for one exchange; the str.contains scan runs once per exchange."""
+        df = self.instruments_df
+        if "exch_seg" not in df.columns:
+            return df
+        view = self._exchange_views.get(exchange)
+        if view is None:
+            view = df[df["exch_seg"].str.contains(exchange, case=False, na=False)]
+            self._exchange_views[exchange] = view
+        return view
+
+    def _instruments_parquet(self) -> str:
+        return os.path.splitext(self.instruments_csv)[0] + ".parquet"
+
+    def _read_instruments_cache(self) -> Optional[pd.DataFrame]:
+        """
+        On-disk instruments dump, parsed at most once per process while the file
+        is unchanged. A hit also adopts the token maps built from that frame.
+        """
+        source = self._instruments_source()
+        if source is None:
+            return None
+        key = _file_key(source)
+        hit = _INSTRUMENTS_CACHE.get(key)
+        if hit is not None:
+            _INSTRUMENTS_CACHE.move_to_end(key)
+            df, self._token_maps = hit
+            return df
+
+        df = self._load_instruments_file(source)
+        if df is not None:
+            _INSTRUMENTS_CACHE[key] = (df, self._token_maps)
+            if len(_INSTRUMENTS_CACHE) > INSTRUMENTS_CACHE_SIZE:
+                _INSTRUMENTS_CACHE.popitem(last=False)
         return df
 
-    def _resolve_token(self, instruments: pd.DataFrame, symbol: str, exchange: str = "NSE") -> Optional[str]:
-        cands = instruments
-        if "exch_seg" in cands.columns:
-            cands = cands[cands["exch_seg"].str.contains(exchange, case=False, na=False)]
-        for col in ["tradingsymbol", "symbol", "name"]:
-            if col in cands.columns:
-                row = cands.loc[cands[col] == symbol]
-                if not row.empty:
-                    token_col = "token" if "token" in row.columns else ("instrument_token" if "instrument_token" in row.columns else None)
-                    if token_col:
-                        return str(row.iloc[0][token_col])
+    def _instruments_source(self) -> Optional[str]:
+        """
+        The on-disk instruments dump to load: the Parquet copy when it is at least
+        as new as the CSV, else the CSV (a one-time migration source).
+        """
+        parquet_path = self._instruments_parquet()
+        if pyarrow is not None and os.path.exists(parquet_path) and (
+            not os.path.exists(self.instruments_csv)
+            or os.path.getmtime(parquet_path) >= os.path.getmtime(self.instruments_csv)
+        ):
+            return parquet_path
+        if os.path.exists(self.instruments_csv):
+            return self.instruments_csv
+        return None
+
+    def _load_instruments_file(self, path: str) -> Optional[pd.DataFrame]:
+        """Parse one instruments dump; a CSV is converted to Parquet for next time."""
+        if path != self.instruments_csv:
+            try:
+                return pd.read_parquet(path, engine="pyarrow")
+            except Exception as e:
+                logger.warning(f"AngelOne: could not read {path}: {e}. Using CSV.")
+
+        if os.path.exists(self.instruments_csv):
+            # token is an identifier: keep it as text instead of inferring an int column
+            df = pd.read_csv(self.instruments_csv, low_memory=False, dtype={"token": str})  # <-- Added low_memory=False here
+            self._write_instruments_parquet(df)
+            return df
         return None
 
+    def _write_instruments_parquet(self, df: pd.DataFrame) -> bool:
+        if pyarrow is None:
+            return False
+        try:
+            df.to_parquet(self._instruments_parquet(), engine="pyarrow", compression="snappy", index=False)
+            return True
+        except Exception as e:
+            logger.debug(f"AngelOne: Parquet instruments cache not written: {e}")
+            return False
+
+    def _token_map(self, exchange: str = "NSE") -> Dict[str, str]:
+        """
+        symbol -> token for one exchange, matching on tradingsymbol, then symbol,
+        then name (first listing wins), built from the column arrays in one go.
+        """
+        if exchange not in self._token_maps and self.instruments_df is None:
+            # may adopt maps already built for the same instruments file
+            self.get_instruments(exchange)
+        if exchange not in self._token_maps:
+            cands = self._exchange_view(exchange)
+            token_col = "token" if "token" in cands.columns else ("instrument_token" if "instrument_token" in cands.columns else None)
+            mapping: Dict[str, str] = {}
+            if token_col:
+                toks = cands[token_col].astype(str).to_numpy()[::-1]
+                # Lowest-priority column first so higher-priority matches overwrite it
+                for col in ["name", "symbol", "tradingsymbol"]:
+                    if col in cands.columns:
+                        mapping.update(zip(cands[col].to_numpy()[::-1].tolist(), toks.tolist()))
+            self._token_maps[exchange] = mapping
+        return self._token_maps[exchange]
+
+    def _resolve_token(self, symbol: str, exchange: str = "NSE") -> Optional[str]:
+        # Exact key first; upper() only on a miss
+        token_map = self._token_map(exchange)
+        token = token_map.get(symbol)
+        if token is None:
+            token = token_map.get(symbol.upper())
+        return token
+
     def get_historical_candles(self, symbol: str, interval: str, from_dt: datetime, to_dt: datetime, exchange: str = "NSE") -> pd.DataFrame:
-        instruments = self.get_instruments(exchange)
-        token = self._resolve_token(instruments, symbol, exchange=exchange)
+        cache_key = (symbol, interval, from_dt, to_dt, exchange)
+        cached = self._hist_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        token = self._resolve_token(symbol, exchange=exchange)
         if token is None:
             raise ValueError(f"AngelOne: token not found for {symbol} ({exchange})")
 
@@ -321,6 +622,25 @@ class AngelOneInterface:
             if self.smart is None:  # Still None after authentication attempt
                 raise RuntimeError("Failed to initialize SmartAPI client for getting historical data")
 
+        # Long ranges go out as per-window calls that overlap in flight;
+        # _throttle_hist still spaces their starts by ANGELONE_RATE_SEC
+        windows = _split_windows(from_dt, to_dt, self.MAX_DAYS.get(interval), step=timedelta(minutes=1))
+        if len(windows) == 1:
+            candles = self._fetch_candles(exchange, token, interval, *windows[0])
+        else:
+            candles = []
+            with ThreadPoolExecutor(max_workers=HIST_FETCH_CONCURRENCY) as pool:
+                for part in pool.map(lambda w: self._fetch_candles(exchange, token, interval, *w), windows):
+                    candles.extend(part)
+        cols = ["datetime", "open", "high", "low", "close", "volume"]
+        df = pd.DataFrame(candles, columns=cols)
+        if not df.empty:
+            df["datetime"] = _parse_candle_times(df["datetime"])
+            df["symbol"] = symbol
+        self._hist_cache.put(cache_key, to_dt, df)
+        return df
+
+    def _fetch_candles(self, exchange: str, token: str, interval: str, from_dt: datetime, to_dt: datetime) -> List[list]:
         params = {
             "exchange": exchange,
             "symboltoken": token,
@@ -330,13 +650,7 @@ class AngelOneInterface:
         }
         self._throttle_hist()
         resp = self._get_candles_with_retry(params)
-        candles = resp.get("data", []) if resp else []
-        cols = ["datetime", "open", "high", "low", "close", "volume"]
-        df = pd.DataFrame(candles, columns=cols)
-        if not df.empty:
-            df["datetime"] = pd.to_datetime(df["datetime"])
-            df["symbol"] = symbol
-        return df
+        return (resp.get("data") or []) if resp else []
 
     def get_historical_data(self, symbol: str, interval: str, from_date: datetime, to_date: datetime, exchange: str = "NSE", **kwargs) -> pd.DataFrame:
         norm = (interval or "").lower()
@@ -363,6 +677,10 @@ class AngelOneInterface:
                 angel_interval = "FIFTEEN_MINUTE"
         return self.get_historical_candles(symbol, angel_interval, from_date, to_date, exchange=exchange)
 
+    async def get_historical_data_many(self, symbols: List[str], interval: str, from_date: datetime, to_date: datetime, exchange: str = "NSE", **kwargs) -> List[pd.DataFrame]:
+        """get_historical_data for several symbols concurrently; calls still honour _throttle_hist."""
+        return await _fetch_many(self.get_historical_data, symbols, interval, from_date, to_date, exchange=exchange, **kwargs)
+
     def get_historical_data_by_interval(self, symbol: str, interval: str, from_date: datetime, to_date: datetime, exchange: str = "NSE", **kwargs) -> pd.DataFrame:
         return self.get_historical_candles(symbol, interval, from_date, to_date, exchange=exchange)
 
@@ -373,16 +691,17 @@ class AngelOneInterface:
             if self.smart is None:  # Still None after authentication attempt
                 raise RuntimeError("Failed to initialize SmartAPI client for getting LTP")
                 
-        data = self.smart.ltpData(exchange, symbol, self._resolve_token(self.get_instruments(exchange), symbol, exchange))
+        data = self.smart.ltpData(exchange, symbol, self._resolve_token(symbol, exchange))
         return float(data["data"]["ltp"])
 
     def _throttle_hist(self):
-        gap = self._min_hist_gap
-        now = time.perf_counter()
-        wait = gap - (now - getattr(self, "_last_hist_call", 0.0))
-        if wait > 0:
-            time.sleep(wait)
-        self._last_hist_call = time.perf_counter()
+        with self._hist_lock:
+            gap = self._min_hist_gap
+            now = time.perf_counter()
+            wait = gap - (now - getattr(self, "_last_hist_call", 0.0))
+            if wait > 0:
+                time.sleep(wait)
+            self._last_hist_call = time.perf_counter()
 
     def _get_candles_with_retry(self, params, retries: int = 5):
         # Ensure SmartAPI client is initialized
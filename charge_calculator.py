@@ -1,6 +1,8 @@
 # File: charge_calculator.py
 # Simulates brokerage and statutory charges for a trade.
 
+import numpy as np
+
 def calculate_charges(quantity: int, price: float, is_intraday: bool = True):
     """
     Calculates estimated charges for a single leg of a trade (either buy or sell).
@@ -35,4 +37,41 @@ def calculate_charges(quantity: int, price: float, is_intraday: bool = True):
         "txn_charges": txn_charges,
         "gst": gst,
         "total": total_charges
-    }
\ No newline at end of file
+    }
+
+
+def calculate_charges_vec(quantity, price, is_intraday=True):
+    """
+    Array version of calculate_charges: one call charges a whole batch of legs.
+    Takes NumPy arrays (scalars broadcast) and returns a dict of arrays with the
+    same keys, each element matching calculate_charges for that leg.
+    """
+    quantity = np.asarray(quantity)
+    price = np.asarray(price, dtype=np.float64)
+    is_intraday = np.asarray(is_intraday, dtype=bool)
+    # Give every input the leg shape so a scalar is_intraday still yields
+    # per-leg brokerage instead of a 0-d array
+    quantity, price, is_intraday = np.broadcast_arrays(quantity, price, is_intraday)
+
+    turnover = quantity * price
+    brokerage = np.where(is_intraday, 20.0, 0.0)
+    stt = np.where(is_intraday, 0.00025, 0.001) * turnover
+    txn_charges = 0.0000345 * turnover
+    gst = 0.18 * (brokerage + txn_charges)
+    sebi_charges = 0.000001 * turnover
+    stamp_duty = 0.00003 * turnover
+
+    total_charges = brokerage + stt + txn_charges + gst + sebi_charges + stamp_duty
+
+    result = {
+        "turnover": turnover,
+        "brokerage": brokerage,
+        "stt": stt,
+        "txn_charges": txn_charges,
+        "gst": gst,
+        "total": total_charges
+    }
+    for key, values in result.items():
+        if values.shape != quantity.shape:
+            raise ValueError(f"{key} has shape {values.shape}, expected {quantity.shape}")
+    return result
@@ -63,6 +63,7 @@ class DatabaseManager:
                     position_details TEXT NOT NULL -- Position dictionary ko JSON string ke roop mein save karein
                 )
             """)
+            self._migrate_open_positions(cursor)
 
             self.conn.commit()
             logger.info("✅ Database tables verified/created successfully.")
@@ -70,6 +71,23 @@ class DatabaseManager:
             logger.error(f"❌ Error creating tables: {e}")
             self.conn.rollback()
 
+    def _migrate_open_positions(self, cursor):
+        """
+        action/entry_price/quantity ko alag columns mein rakhta hai taaki SQL
+        unhe JSON parse kiye bina aggregate kar sake. Purani rows JSON se backfill hoti hain.
+        """
+        existing = {row[1] for row in cursor.execute("PRAGMA table_info(open_positions)")}
+        for column, column_type in (("action", "TEXT"), ("entry_price", "REAL"), ("quantity", "INTEGER")):
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE open_positions ADD COLUMN {column} {column_type}")
+        cursor.execute("""
+            UPDATE open_positions SET
+                action = json_extract(position_details, '$.action'),
+                entry_price = json_extract(position_details, '$.entry_price'),
+                quantity = json_extract(position_details, '$.quantity')
+            WHERE entry_price IS NULL
+        """)
+
     # --- NAYE FUNCTIONS ---
 
     def save_open_position(self, strategy_name, symbol, position_details):
@@ -79,11 +97,16 @@ class DatabaseManager:
         try:
             with self.conn:
                 self.conn.execute("""
-                    INSERT INTO open_positions (id, strategy_name, symbol, position_details)
-                    VALUES (?, ?, ?, ?)
+                    INSERT INTO open_positions (id, strategy_name, symbol, position_details, action, entry_price, quantity)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
                     ON CONFLICT(id) DO UPDATE SET
-                    position_details=excluded.position_details
-                """, (position_id, strategy_name, symbol, details_json))
+                    position_details=excluded.position_details,
+                    action=excluded.action,
+                    entry_price=excluded.entry_price,
+                    quantity=excluded.quantity
+                """, (position_id, strategy_name, symbol, details_json,
+                      position_details.get('action'), position_details.get('entry_price'),
+                      position_details.get('quantity')))
         except sqlite3.Error as e:
             logger.error(f"❌ Failed to save open position for {symbol}: {e}")
 
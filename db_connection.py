@@ -0,0 +1,36 @@
+# File: db_connection.py
+# Shared SQLite connection for the analysis and monitoring scripts.
+
+import atexit
+import os
+import sqlite3
+import threading
+
+# One tuning for every reader of the trading database: WAL so reports never block
+# the live engine's writes, a 64 MB page cache and memory-mapped reads
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+)
+
+_conns = {}
+_conns_lock = threading.Lock()
+
+def get_conn(db_path: str = "trading_data.db") -> sqlite3.Connection:
+    """
+    Return the process-wide connection to db_path, opening it on first use.
+    Callers must not close it; it is closed at interpreter exit.
+    """
+    key = os.path.abspath(db_path)
+    with _conns_lock:
+        conn = _conns.get(key)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            for pragma in SQLITE_PRAGMAS:
+                conn.execute(pragma)
+            atexit.register(conn.close)
+            _conns[key] = conn
+        return conn
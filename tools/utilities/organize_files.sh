@@ -28,6 +28,7 @@ mv daily_monitor.py analysis/monitoring/ 2>/dev/null
 mv daily_report_* analysis/reports/ 2>/dev/null
 mv daily_stats_* analysis/reports/ 2>/dev/null
 mv comprehensive_trade_report.json analysis/reports/ 2>/dev/null
+mv comprehensive_trade_report_trades.jsonl analysis/reports/ 2>/dev/null
 mv root_cause_analysis.json analysis/reports/ 2>/dev/null
 mv real_pnl_analysis.json analysis/reports/ 2>/dev/null
 